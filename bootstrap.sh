@@ -1,6 +1,7 @@
 #!/bin/bash
 # Bootstrap script para instalação facilitada do VPS Installer
 # Uso: curl -fsSL https://raw.githubusercontent.com/SEU_USUARIO/SEU_REPO/main/bootstrap.sh | sudo bash
+# Offline: sudo bash bootstrap.sh /caminho/pacote-offline.tar
 
 set -e
 
@@ -28,7 +29,36 @@ if [ "$EUID" -ne 0 ]; then
     exit 1
 fi
 
-print_color "[1/4] Detectando sistema operacional..." "$YELLOW"
+# Caminho absoluto do pacote offline (o diretório de trabalho muda adiante)
+OFFLINE_BUNDLE="${1:-$OFFLINE_BUNDLE}"
+if [ -n "$OFFLINE_BUNDLE" ]; then
+    OFFLINE_BUNDLE="$(readlink -f "$OFFLINE_BUNDLE")"
+fi
+
+# Cache local de wheels Python (reaproveitado entre execuções e alimentado pelo pacote offline)
+WHEELS_DIR="${WHEELS_DIR:-/var/cache/vps-installer/wheels}"
+PY_DEPS="requests"
+INSTALL_DIR="/opt/vps-installer"
+LOG_FILE="/var/log/vps-installer-bootstrap.log"
+TEMPOS="$(mktemp)"
+: > "$LOG_FILE"
+
+# Executa um passo registrando duração e resultado em $TEMPOS (saída vai para o log)
+etapa() {
+    local nome=$1
+    shift
+    local inicio=$(date +%s%N)
+    local status="ok"
+    "$@" >> "$LOG_FILE" 2>&1 || status="falhou"
+    echo "$nome|$(( ($(date +%s%N) - inicio) / 1000000 ))|$status" >> "$TEMPOS"
+    [ "$status" = "ok" ]
+}
+
+etapa_pulada() {
+    echo "$1|0|já presente" >> "$TEMPOS"
+}
+
+print_color "[1/5] Detectando sistema operacional e componentes existentes..." "$YELLOW"
 
 # Detectar OS
 if [ -f /etc/os-release ]; then
@@ -40,32 +70,119 @@ else
     exit 1
 fi
 
-# Instalar dependências baseado no OS
 case $OS in
-    ubuntu|debian)
-        print_color "Sistema detectado: $OS $VERSION" "$GREEN"
-        print_color "[2/4] Instalando dependências..." "$YELLOW"
-        apt-get update -qq >/dev/null 2>&1
-        apt-get install -y python3 python3-pip curl wget git dialog >/dev/null 2>&1
-        pip3 install requests >/dev/null 2>&1
-        ;;
-    centos|rhel|fedora)
-        print_color "Sistema detectado: $OS $VERSION" "$GREEN"
-        print_color "[2/4] Instalando dependências..." "$YELLOW"
-        yum install -y python3 python3-pip curl wget git >/dev/null 2>&1
-        pip3 install requests >/dev/null 2>&1
-        ;;
+    ubuntu|debian) GERENCIADOR="apt" ;;
+    centos|rhel|fedora) GERENCIADOR="yum" ;;
     *)
         print_color "Sistema operacional $OS não suportado!" "$RED"
         exit 1
         ;;
 esac
+print_color "Sistema detectado: $OS $VERSION" "$GREEN"
+
+# Só entram na instalação os pacotes cujo comando ainda não existe
+PACOTES=()
+for comando in python3 curl wget git; do
+    command -v "$comando" >/dev/null 2>&1 || PACOTES+=("$comando")
+done
+if [ "$GERENCIADOR" = "apt" ] && ! command -v dialog >/dev/null 2>&1; then
+    PACOTES+=("dialog")
+fi
+PRECISA_PY_DEPS=1
+if command -v python3 >/dev/null 2>&1 && python3 -c 'import requests' 2>/dev/null; then
+    PRECISA_PY_DEPS=0
+elif ! python3 -m pip --version >/dev/null 2>&1; then
+    PACOTES+=("python3-pip")
+fi
+
+instalar_pacotes() {
+    if [ "$GERENCIADOR" = "apt" ]; then
+        # Espera pelo lock do dpkg em vez de falhar quando o get.docker.com usa o apt ao mesmo tempo
+        apt-get -o DPkg::Lock::Timeout=600 update -qq
+        DEBIAN_FRONTEND=noninteractive apt-get -o DPkg::Lock::Timeout=600 install -y -qq "${PACOTES[@]}"
+    else
+        yum install -y -q "${PACOTES[@]}"
+    fi
+}
+
+instalar_docker_engine() {
+    curl -fsSL https://get.docker.com -o /tmp/get-docker.sh
+    # Mesmo comportamento de espera pelo lock para o apt chamado pelo script da Docker
+    if [ "$GERENCIADOR" = "apt" ]; then
+        echo 'DPkg::Lock::Timeout "600";' > /etc/apt/apt.conf.d/99vps-installer-lock
+    fi
+    sh /tmp/get-docker.sh
+    local codigo=$?
+    rm -f /tmp/get-docker.sh /etc/apt/apt.conf.d/99vps-installer-lock
+    [ $codigo -eq 0 ] && systemctl enable --now docker
+}
+
+print_color "[2/5] Instalando pacotes do sistema e Docker em paralelo..." "$YELLOW"
+[ ${#PACOTES[@]} -gt 0 ] && print_color "  - Pacotes ausentes: ${PACOTES[*]}" "$YELLOW"
+
+FALHAS=0
+PID_PACOTES=""
+PID_DOCKER=""
+if [ ${#PACOTES[@]} -gt 0 ]; then
+    etapa "pacotes do sistema" instalar_pacotes &
+    PID_PACOTES=$!
+else
+    etapa_pulada "pacotes do sistema"
+fi
+
+if command -v docker >/dev/null 2>&1; then
+    etapa_pulada "docker engine"
+elif [ -n "$OFFLINE_BUNDLE" ]; then
+    print_color "  ! Docker não encontrado: o pacote offline requer o Docker já instalado" "$RED"
+    exit 1
+else
+    # Sem curl o script da Docker só pode ser baixado depois dos pacotes do sistema
+    if ! command -v curl >/dev/null 2>&1 && [ -n "$PID_PACOTES" ]; then
+        wait "$PID_PACOTES" || FALHAS=1
+        PID_PACOTES=""
+    fi
+    etapa "docker engine" instalar_docker_engine &
+    PID_DOCKER=$!
+fi
+
+[ -n "$PID_PACOTES" ] && { wait "$PID_PACOTES" || FALHAS=1; }
+[ -n "$PID_DOCKER" ] && { wait "$PID_DOCKER" || FALHAS=1; }
+if [ $FALHAS -ne 0 ]; then
+    print_color "Falha ao instalar dependências. Veja $LOG_FILE" "$RED"
+    exit 1
+fi
 
 print_color "Dependências instaladas com sucesso!" "$GREEN"
 
+# Dependências Python isoladas em $INSTALL_DIR/vendor a partir do cache de wheels
+instalar_deps_python() {
+    mkdir -p "$WHEELS_DIR"
+    if [ -d "$INSTALL_DIR/wheels" ]; then
+        cp -n "$INSTALL_DIR"/wheels/*.whl "$WHEELS_DIR"/ 2>/dev/null || true
+    fi
+    if ! python3 -m pip install -q --no-index --find-links "$WHEELS_DIR" \
+            --target "$INSTALL_DIR/vendor" $PY_DEPS 2>/dev/null; then
+        # Cache vazio ou incompleto: baixa uma vez e instala a partir dele
+        python3 -m pip download -q -d "$WHEELS_DIR" $PY_DEPS &&
+            python3 -m pip install -q --no-index --find-links "$WHEELS_DIR" --target "$INSTALL_DIR/vendor" $PY_DEPS ||
+            { [ "$GERENCIADOR" = "apt" ] && apt-get install -y -qq python3-requests; }
+    fi
+}
+
+preparar_python() {
+    if [ $PRECISA_PY_DEPS -eq 1 ]; then
+        print_color "  - Instalando dependências Python do cache de wheels..." "$YELLOW"
+        etapa "dependências python" instalar_deps_python || {
+            print_color "Falha ao instalar dependências Python. Veja $LOG_FILE" "$RED"
+            exit 1
+        }
+    else
+        etapa_pulada "dependências python"
+    fi
+}
+
 # Criar diretório de trabalho
-INSTALL_DIR="/opt/vps-installer"
-print_color "[3/4] Criando diretório de instalação em $INSTALL_DIR..." "$YELLOW"
+print_color "[3/5] Criando diretório de instalação em $INSTALL_DIR..." "$YELLOW"
 
 # Limpar instalação anterior se existir
 if [ -d "$INSTALL_DIR" ]; then
@@ -78,7 +195,19 @@ cd "$INSTALL_DIR"
 # URL base do repositório (ajuste conforme seu repo)
 REPO_URL="https://raw.githubusercontent.com/lucasdaniellopes/Instalador/main"
 
-print_color "[4/4] Baixando arquivos do instalador..." "$YELLOW"
+# Pacote offline: instalador, wheels e imagens vêm do arquivo local, sem downloads
+if [ -n "$OFFLINE_BUNDLE" ]; then
+    print_color "[4/5] Extraindo instalador do pacote offline..." "$YELLOW"
+    # Tudo menos as imagens (carregadas direto do pacote): wheels/, plugins/ e stacks/configs/ podem faltar
+    tar -xf "$OFFLINE_BUNDLE" --exclude='imagens.tar.*' --exclude='bundle.json' || {
+        print_color "Falha ao extrair $OFFLINE_BUNDLE" "$RED"
+        exit 1
+    }
+    print_color "[5/5] Preparando dependências Python..." "$YELLOW"
+    preparar_python
+    etapa "carga das imagens" python3 instalador_vps.py pacote-offline carregar "$OFFLINE_BUNDLE" || exit 1
+else
+print_color "[4/5] Baixando arquivos do instalador..." "$YELLOW"
 
 # Função para baixar arquivo com verificação
 download_file() {
@@ -99,57 +228,53 @@ download_file() {
     fi
 }
 
-# Baixar arquivos principais
-print_color "  - Baixando instalador principal..." "$YELLOW"
-download_file "instalador_vps.py" ""
-
-print_color "  - Baixando implementações das stacks..." "$YELLOW"
-download_file "stack_implementations.py" ""
-
-print_color "  - Baixando script bash alternativo..." "$YELLOW"
-download_file "deploy_stacks_v2.sh" ""
-chmod +x deploy_stacks_v2.sh
-
-# Criar estrutura de diretórios
-mkdir -p stacks/configs
-
-# Baixar arquivos YAML das stacks
-print_color "  - Baixando configurações das stacks..." "$YELLOW"
-stacks=(
-    "traefik.yaml"
-    "portainer.yaml"
-    "postgres.yaml"
-    "pgvector.yaml"
-    "pgbouncer.yaml"
-    "redis.yaml"
-    "evolution.yaml"
-    "chatwoot.yaml"
-    "directus.yaml"
-    "minio.yaml"
-    "rabbitmq.yaml"
-    "stirlingpdf.yaml"
-    "prometheus.yaml"
-    "grafana.yaml"
-    "dozzle.yaml"
-)
-
-for stack in "${stacks[@]}"; do
-    download_file "$stack" "stacks" || print_color "  ! Stack $stack não encontrada (opcional)" "$YELLOW"
-done
+# Downloads simultâneos; falha em arquivo obrigatório interrompe o bootstrap
+baixar_arquivos() {
+    local pids=()
+    local arquivos=("instalador_vps.py" "stack_implementations.py" "stack_plugins.py" "backup_manager.py"
+                    "fleet_manager.py" "frota_inventario.exemplo.json" "offline_bundle.py"
+                    "deploy_stacks.sh" "deploy_stacks_v2.sh")
+    for arquivo in "${arquivos[@]}"; do
+        download_file "$arquivo" "" &
+        pids+=($!)
+    done
 
-# Baixar configurações
-print_color "  - Baixando arquivos de configuração..." "$YELLOW"
-configs=(
-    "entrypoint_postgres"
-    "config_prometheus"
-    "config_dozzle"
-)
+    # Arquivos YAML e configurações das stacks são opcionais
+    mkdir -p stacks/configs
+    for stack in traefik portainer postgres pgvector pgbouncer redis evolution chatwoot directus \
+                 minio rabbitmq stirlingpdf prometheus grafana dozzle; do
+        { download_file "$stack.yaml" "stacks" || print_color "  ! Stack $stack.yaml não encontrada (opcional)" "$YELLOW"; } &
+    done
+    for config in config_prometheus config_dozzle; do
+        { download_file "$config" "stacks/configs" || print_color "  ! Config $config não encontrada (opcional)" "$YELLOW"; } &
+    done
 
-for config in "${configs[@]}"; do
-    download_file "$config" "stacks/configs" || print_color "  ! Config $config não encontrada (opcional)" "$YELLOW"
-done
+    local falhas=0
+    for pid in "${pids[@]}"; do
+        wait "$pid" || falhas=1
+    done
+    wait
+    chmod +x deploy_stacks.sh deploy_stacks_v2.sh
+    return $falhas
+}
+
+etapa "download do instalador" baixar_arquivos || {
+    print_color "Falha ao baixar o instalador. Veja $LOG_FILE" "$RED"
+    exit 1
+}
 
 print_color "\n✓ Download concluído com sucesso!" "$GREEN"
+print_color "[5/5] Preparando dependências Python..." "$YELLOW"
+preparar_python
+fi
+
+# Tempo por passo
+echo ""
+print_color "Tempo por passo:" "$GREEN"
+while IFS='|' read -r nome ms status; do
+    printf "  %-26s %6d.%d s  %s\n" "$nome" $((ms / 1000)) $((ms % 1000 / 100)) "$status"
+done < "$TEMPOS"
+rm -f "$TEMPOS"
 
 # Criar script de atalho
 cat > /usr/local/bin/vps-installer << 'EOF'
@@ -0,0 +1,188 @@
+"""
+Modo frota: instalação em vários hosts VPS ao mesmo tempo via SSH
+- Inventário JSON com hosts e manifesto de instalação por host
+- Sessões SSH multiplexadas (ControlMaster) reutilizadas em todos os passos
+- Limite de hosts simultâneos, progresso agregado e resumo final
+"""
+import io
+import os
+import json
+import shlex
+import tarfile
+import threading
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from stack_plugins import PluginIndex
+
+DIRETORIO_REMOTO = "/opt/vps-installer"
+# Diretórios entram inteiros: stacks/configs/ tem os arquivos usados por create_config()
+ARQUIVOS_INSTALADOR = ["instalador_vps.py", "stack_implementations.py", "stack_plugins.py", "backup_manager.py",
+                       "offline_bundle.py", "images.lock.json", "stacks/configs"]
+
+# Docker, Swarm e a dependência Python do instalador, idempotente
+PREPARAR_HOST = """
+set -e
+command -v docker >/dev/null 2>&1 || curl -fsSL https://get.docker.com | sh
+if [ "$(docker info --format '{{.Swarm.LocalNodeState}}')" != "active" ]; then
+    docker swarm init --advertise-addr "$(hostname -I | awk '{print $1}')"
+fi
+python3 -c 'import requests' 2>/dev/null || pip3 install -q requests || apt-get install -y -qq python3-requests
+"""
+
+
+class FleetHost:
+    """Um host do inventário com sua sessão SSH multiplexada"""
+
+    def __init__(self, nome: str, dados: Dict, padrao: Dict, dir_control: str):
+        self.nome = nome
+        self.endereco = dados.get("endereco", nome)
+        self.usuario = dados.get("usuario", padrao.get("usuario", "root"))
+        self.porta = str(dados.get("porta", padrao.get("porta", 22)))
+        chave = dados.get("chave", padrao.get("chave"))
+        self.chave = os.path.expanduser(chave) if chave else None
+        self.manifesto = {**padrao.get("manifesto", {}), **dados.get("manifesto", {})}
+        self.control_path = os.path.join(dir_control, f"{nome}.sock")
+
+    def _ssh_base(self) -> List[str]:
+        comando = ["ssh", "-p", self.porta,
+                   "-o", "BatchMode=yes",
+                   "-o", "StrictHostKeyChecking=accept-new",
+                   "-o", "ControlMaster=auto",
+                   "-o", f"ControlPath={self.control_path}",
+                   "-o", "ControlPersist=120",
+                   "-o", "ServerAliveInterval=15"]
+        if self.chave:
+            comando += ["-i", self.chave]
+        return comando + [f"{self.usuario}@{self.endereco}"]
+
+    def conectar(self, timeout: int = 20):
+        subprocess.run(self._ssh_base()[:-1] + ["-o", f"ConnectTimeout={timeout}", "-MNf",
+                                                f"{self.usuario}@{self.endereco}"],
+                       check=True, capture_output=True, timeout=timeout + 5)
+
+    def desconectar(self):
+        subprocess.run(self._ssh_base()[:-1] + ["-O", "exit", f"{self.usuario}@{self.endereco}"],
+                       capture_output=True)
+
+    def executar(self, comando: str, log, entrada: Optional[bytes] = None) -> int:
+        """Executa no host pela sessão mestre, gravando stdout/stderr no log do host"""
+        processo = subprocess.Popen(self._ssh_base() + [comando], stdin=subprocess.PIPE,
+                                    stdout=log, stderr=subprocess.STDOUT)
+        processo.communicate(entrada)
+        return processo.returncode
+
+
+class FleetManager:
+    """Executa o pipeline de instalação em todos os hosts do inventário"""
+
+    PASSOS = ["conectar", "enviar", "preparar", "instalar"]
+
+    def __init__(self, inventario: str, paralelo: int = 8, dir_logs: str = "frota_logs"):
+        with open(inventario) as f:
+            self.inventario = json.load(f)
+        self.paralelo = max(1, paralelo)
+        self.dir_logs = dir_logs
+        self.dir_control = os.path.join(os.path.expanduser("~"), ".ssh", "vps-frota")
+        self._lock = threading.Lock()
+        self.progresso: Dict[str, str] = {}
+
+    def hosts(self, filtro: Optional[List[str]] = None) -> List[FleetHost]:
+        padrao = self.inventario.get("padrao", {})
+        hosts = []
+        for dados in self.inventario.get("hosts", []):
+            nome = dados.get("nome") or dados["endereco"]
+            if filtro and nome not in filtro:
+                continue
+            if "manifesto_arquivo" in dados:
+                with open(dados["manifesto_arquivo"]) as f:
+                    dados = {**dados, "manifesto": json.load(f)}
+            hosts.append(FleetHost(nome, dados, padrao, self.dir_control))
+        return hosts
+
+    def _pacote(self) -> bytes:
+        """Tar em memória com os módulos do instalador, enviado uma vez por host via stdin"""
+        base = os.path.dirname(os.path.abspath(__file__))
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+            for arquivo in ARQUIVOS_INSTALADOR:
+                if os.path.exists(os.path.join(base, arquivo)):
+                    tar.add(os.path.join(base, arquivo), arcname=arquivo)
+            # Plugins de stack vão para plugins/ no host, venham de onde vierem
+            for caminho in PluginIndex().arquivos():
+                tar.add(caminho, arcname=f"plugins/{os.path.basename(caminho)}")
+        return buffer.getvalue()
+
+    def _atualizar(self, host: str, estado: str):
+        with self._lock:
+            self.progresso[host] = estado
+            concluidos = sum(1 for e in self.progresso.values() if e in ("ok", "falhou"))
+            print(f"[{concluidos}/{len(self.progresso)}] {host}: {estado}")
+
+    def _processar(self, host: FleetHost, pacote: bytes, retomar: bool) -> Dict:
+        inicio = time.time()
+        resultado = {"host": host.nome, "ok": False, "passo": None, "duracao": 0.0}
+        caminho_log = os.path.join(self.dir_logs, f"{host.nome}.log")
+        with open(caminho_log, "ab") as log:
+            try:
+                for passo in self.PASSOS:
+                    resultado["passo"] = passo
+                    self._atualizar(host.nome, passo)
+                    if passo == "conectar":
+                        host.conectar()
+                        continue
+                    if passo == "enviar":
+                        comando = f"mkdir -p {DIRETORIO_REMOTO} && tar -C {DIRETORIO_REMOTO} -xzf -"
+                        entrada = pacote
+                    elif passo == "preparar":
+                        comando, entrada = "bash -s", PREPARAR_HOST.encode()
+                    else:
+                        comando = (f"cd {DIRETORIO_REMOTO} && python3 instalador_vps.py"
+                                   f"{' --resume' if retomar else ''} instalar --manifesto -")
+                        entrada = json.dumps(host.manifesto).encode()
+                    codigo = host.executar(comando, log, entrada)
+                    if codigo != 0:
+                        raise RuntimeError(f"código de saída {codigo}")
+                resultado["ok"] = True
+                resultado["passo"] = None
+            except Exception as e:
+                resultado["erro"] = str(e)
+                log.write(f"\n[frota] {resultado['passo']}: {e}\n".encode())
+            finally:
+                host.desconectar()
+        resultado["duracao"] = time.time() - inicio
+        self._atualizar(host.nome, "ok" if resultado["ok"] else "falhou")
+        return resultado
+
+    def executar(self, filtro: Optional[List[str]] = None, retomar: bool = False) -> bool:
+        hosts = self.hosts(filtro)
+        if not hosts:
+            print("[ERRO] Nenhum host selecionado no inventário")
+            return False
+        os.makedirs(self.dir_logs, exist_ok=True)
+        os.makedirs(self.dir_control, mode=0o700, exist_ok=True)
+        self.progresso = {host.nome: "aguardando" for host in hosts}
+        pacote = self._pacote()
+
+        print(f"[+] Frota: {len(hosts)} host(s), até {self.paralelo} em paralelo. Logs em {self.dir_logs}/")
+        resultados = []
+        with ThreadPoolExecutor(max_workers=min(self.paralelo, len(hosts))) as executor:
+            futuros = [executor.submit(self._processar, host, pacote, retomar) for host in hosts]
+            for futuro in as_completed(futuros):
+                resultados.append(futuro.result())
+
+        print("\n" + "=" * 60)
+        print(f"{'HOST':<30} {'RESULTADO':<24} {'TEMPO':>6}")
+        for r in sorted(resultados, key=lambda r: (r["ok"], r["host"])):
+            estado = "ok" if r["ok"] else f"falhou em {r['passo']}"
+            print(f"{r['host']:<30} {estado:<24} {r['duracao']:>5.0f}s")
+        falhas = [r for r in resultados if not r["ok"]]
+        print("=" * 60)
+        print(f"{len(resultados) - len(falhas)} ok, {len(falhas)} com falha")
+        if falhas:
+            nomes = " ".join(shlex.quote(r["host"]) for r in falhas)
+            print(f"Para retomar apenas os que falharam: "
+                  f"instalador_vps.py --resume frota <inventario> --hosts {nomes}")
+        return not falhas
@@ -7,18 +7,58 @@ Instalador VPS Híbrido - Versão Melhorada
 - Prefixos de domínio customizáveis
 - Geração de configuração DNS Cloudflare
 """
+import time
+
+# Referência do orçamento de inicialização (--medir-inicio): inclui os imports abaixo
+_INICIO = time.perf_counter()
+
 import os
 import subprocess
 import sys
 import json
-import requests
+import argparse
+import importlib
+
+# Dependências Python instaladas pelo bootstrap a partir do cache de wheels
+_VENDOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vendor")
+if os.path.isdir(_VENDOR):
+    sys.path.insert(0, _VENDOR)
+
 import secrets
 import string
-import time
+import re
+import hashlib
+import heapq
+import queue
+import threading
+import socket
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Tuple
+from collections.abc import Mapping
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 
+
+class _ImportacaoTardia:
+    """Módulo importado apenas no primeiro acesso a um atributo"""
+
+    def __init__(self, nome: str):
+        self._nome = nome
+        self._modulo = None
+
+    def __getattr__(self, atributo):
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self._nome)
+        return getattr(self._modulo, atributo)
+
+
+# Só os comandos que falam com APIs HTTP pagam o import do requests
+requests = _ImportacaoTardia("requests")
+
+# Orçamento (ms) para comandos que não fazem deploy: catalogo, plano, render, status, logs
+ORCAMENTO_INICIO_MS = 60
+
 # Configuração de stacks e suas propriedades
 STACK_CONFIG = {
     "traefik": {
@@ -29,6 +69,16 @@ STACK_CONFIG = {
         "volumes": ["traefik_certificates"],
         "networks": ["externa"]
     },
+    "registry": {
+        "categoria": "infraestrutura",
+        "descricao": "Cache pull-through do Docker Hub para todos os nós do Swarm",
+        "prefixo": None,
+        "dependencias": [],
+        "volumes": ["registry_data"],
+        "networks": [],
+        # Altera o daemon.json e acessa os nós por SSH: só entra quando pedida explicitamente
+        "sob_demanda": True
+    },
     "portainer": {
         "categoria": "infraestrutura", 
         "descricao": "Interface web para gerenciar Docker",
@@ -42,9 +92,9 @@ STACK_CONFIG = {
         "descricao": "Banco de dados PostgreSQL",
         "prefixo": "pgadmin",
         "dependencias": [],
-        "volumes": ["postgres_data", "postgres_config"],
+        "volumes": ["postgres_data"],
         "networks": ["interna"],
-        "configs": ["entrypoint_postgres"]
+        "backup": {"tipo": "postgres", "servico": "postgres_postgres", "volume": "postgres_data"}
     },
     "pgvector": {
         "categoria": "banco_dados",
@@ -52,7 +102,8 @@ STACK_CONFIG = {
         "prefixo": "pgvector",
         "dependencias": [],
         "volumes": ["pgvector_data"],
-        "networks": ["interna"]
+        "networks": ["interna"],
+        "backup": {"tipo": "postgres", "servico": "pgvector_pgvector", "volume": "pgvector_data"}
     },
     "pgbouncer": {
         "categoria": "banco_dados",
@@ -68,13 +119,22 @@ STACK_CONFIG = {
         "prefixo": "redis",
         "dependencias": [],
         "volumes": ["redis_data"],
-        "networks": ["interna"]
+        "networks": ["interna"],
+        "backup": {"tipo": "redis", "servico": "redis_redis", "volume": "redis_data"}
     },
     "evolution": {
         "categoria": "aplicacao",
         "descricao": "API do WhatsApp",
         "prefixo": "evolution",
         "dependencias": ["postgres", "redis"],
+        "dependencias_opcionais": ["rabbitmq", "chatwoot"],
+        "banco_postgres": {
+            "nome": "evolution",
+            "extensoes": [],
+            "limite_conexoes": 25,
+            "statement_timeout": "60s",
+            "idle_in_transaction_session_timeout": "60s"
+        },
         "volumes": ["evolution_instances"],
         "networks": ["externa", "interna"]
     },
@@ -83,6 +143,14 @@ STACK_CONFIG = {
         "descricao": "Plataforma de atendimento ao cliente",
         "prefixo": "chatwoot",
         "dependencias": ["postgres", "redis"],
+        "dependencias_opcionais": ["minio"],
+        "banco_postgres": {
+            "nome": "chatwoot",
+            "extensoes": ["pg_stat_statements", "pg_trgm", "pgcrypto"],
+            "limite_conexoes": 40,
+            "statement_timeout": "120s",
+            "idle_in_transaction_session_timeout": "60s"
+        },
         "volumes": ["chatwoot_storage"],
         "networks": ["externa", "interna"]
     },
@@ -91,6 +159,14 @@ STACK_CONFIG = {
         "descricao": "CMS Headless",
         "prefixo": "directus",
         "dependencias": ["postgres", "redis"],
+        "dependencias_opcionais": ["minio"],
+        "banco_postgres": {
+            "nome": "directus",
+            "extensoes": [],
+            "limite_conexoes": 25,
+            "statement_timeout": "60s",
+            "idle_in_transaction_session_timeout": "60s"
+        },
         "volumes": ["directus_uploads", "directus_extensions"],
         "networks": ["externa", "interna"]
     },
@@ -161,8 +237,8 @@ PERFIS_INSTALACAO = {
     },
     "completo": {
         "nome": "Completo",
-        "descricao": "Todas as stacks disponíveis",
-        "stacks": list(STACK_CONFIG.keys())
+        "descricao": "Todas as stacks disponíveis (exceto as sob demanda, como o registry)",
+        "stacks": [s for s, info in STACK_CONFIG.items() if not info.get("sob_demanda")]
     }
 }
 
@@ -173,6 +249,10 @@ class ConfigManager:
         self.config_dir = os.path.join(os.path.dirname(__file__), ".vps_installer")
         self.config_file = os.path.join(self.config_dir, "config.json")
         self.portainer_config_file = os.path.join(os.path.dirname(__file__), "portainer_config.json")
+        self.traefik_routes_file = os.path.join(self.config_dir, "traefik_routes.json")
+        self.journal_file = os.path.join(self.config_dir, "install_journal.json")
+        # Fora do diretório privado: o lock pode ser versionado e distribuído para a frota
+        self.image_lock_file = os.path.join(os.path.dirname(__file__), "images.lock.json")
         self._ensure_config_dir()
         
     def _ensure_config_dir(self):
@@ -199,6 +279,95 @@ class ConfigManager:
         with open(self.portainer_config_file, 'w') as f:
             json.dump({"PORTAINER_USERNAME": username, "PORTAINER_PASSWORD": password}, f)
 
+    def load_traefik_routes(self) -> Dict:
+        if os.path.exists(self.traefik_routes_file):
+            with open(self.traefik_routes_file, 'r') as f:
+                return json.load(f)
+        return {}
+
+    def save_traefik_routes(self, rotas: Dict):
+        with open(self.traefik_routes_file, 'w') as f:
+            json.dump(rotas, f, indent=2)
+
+    def load_journal(self) -> Optional[Dict]:
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'r') as f:
+                return json.load(f)
+        return None
+
+    def save_journal(self, journal: Dict):
+        # Escrita atômica: uma queda no meio da gravação não corrompe o journal
+        tmp = f"{self.journal_file}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(journal, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.journal_file)
+
+    def load_image_lock(self) -> Dict:
+        if os.path.exists(self.image_lock_file):
+            with open(self.image_lock_file, 'r') as f:
+                return json.load(f)
+        return {"imagens": {}}
+
+    def save_image_lock(self, lock: Dict):
+        with open(self.image_lock_file, 'w') as f:
+            json.dump(lock, f, indent=2, sort_keys=True)
+
+class InstallJournal:
+    """Journal persistente dos passos de instalação por stack, usado para retomar após falhas"""
+
+    PASSOS = ["recursos", "renderizado", "deploy", "verificado", "pos_deploy"]
+
+    def __init__(self, config_manager: ConfigManager):
+        self.config_manager = config_manager
+        self.dados = config_manager.load_journal() or {}
+
+    def pendente(self) -> bool:
+        return bool(self.dados) and not self.dados.get("concluido")
+
+    def iniciar(self, stacks: List[str], dominio_base: str, prefixos: Dict[str, str], dns_file: str):
+        self.dados = {
+            "iniciado": datetime.now().isoformat(timespec="seconds"),
+            "stacks": stacks,
+            "dominio_base": dominio_base,
+            "prefixos": prefixos,
+            "dns_file": dns_file,
+            "passos": {stack: {} for stack in stacks},
+            "concluido": False,
+        }
+        self.config_manager.save_journal(self.dados)
+
+    def feito(self, stack: str, passo: str) -> bool:
+        return passo in self.dados["passos"].get(stack, {})
+
+    def valor(self, stack: str, passo: str):
+        return self.dados["passos"].get(stack, {}).get(passo)
+
+    def marcar(self, stack: str, passo: str, valor=None):
+        self.dados["passos"].setdefault(stack, {})[passo] = valor or datetime.now().isoformat(timespec="seconds")
+        self.dados["passos"][stack].pop("erro", None)
+        self.config_manager.save_journal(self.dados)
+
+    def invalidar(self, stack: str, a_partir_de: str):
+        """Descarta o passo informado e os seguintes (ex.: YAML mudou, o deploy precisa ser refeito)"""
+        passos = self.dados["passos"].setdefault(stack, {})
+        for passo in self.PASSOS[self.PASSOS.index(a_partir_de):]:
+            passos.pop(passo, None)
+        self.config_manager.save_journal(self.dados)
+
+    def falhou(self, stack: str, erro: str):
+        self.dados["passos"].setdefault(stack, {})["erro"] = erro
+        self.config_manager.save_journal(self.dados)
+
+    def finalizar(self) -> bool:
+        """Marca o journal como concluído se todas as stacks passaram por todos os passos"""
+        completo = all(all(p in self.dados["passos"].get(s, {}) for p in self.PASSOS)
+                       for s in self.dados["stacks"])
+        self.dados["concluido"] = completo
+        self.config_manager.save_journal(self.dados)
+        return completo
+
 class DependencyManager:
     """Gerenciador de dependências entre stacks"""
     
@@ -222,6 +391,48 @@ class DependencyManager:
             
         return dependencies
 
+    @staticmethod
+    def dependencias_efetivas(stack_name: str, presentes: List[str]) -> List[str]:
+        """Dependências obrigatórias mais as opcionais que estão presentes (ex.: minio para armazenamento S3)"""
+        info = STACK_CONFIG.get(stack_name, {})
+        return info.get("dependencias", []) + [d for d in info.get("dependencias_opcionais", []) if d in presentes]
+
+    @staticmethod
+    def get_all_dependents(stack_name: str, candidatos: List[str]) -> List[str]:
+        """Stacks entre os candidatos que dependem (direta ou indiretamente) da stack"""
+        dependentes = []
+        pendentes = [stack_name]
+        while pendentes:
+            atual = pendentes.pop()
+            for candidato in candidatos:
+                deps = DependencyManager.dependencias_efetivas(candidato, candidatos)
+                if atual in deps and candidato not in dependentes:
+                    dependentes.append(candidato)
+                    pendentes.append(candidato)
+        return dependentes
+
+    @staticmethod
+    def deploy_order(stacks: List[str]) -> List[List[str]]:
+        """Agrupa as stacks em ondas de deploy: cada onda só depende das anteriores"""
+        return list(reversed(DependencyManager.removal_order(stacks)))
+
+    @staticmethod
+    def removal_order(stacks: List[str]) -> List[List[str]]:
+        """Agrupa as stacks em ondas de remoção: cada onda não tem dependentes restantes"""
+        restantes = set(stacks)
+        ondas = []
+        while restantes:
+            onda = sorted(
+                s for s in restantes
+                if not any(s in DependencyManager.dependencias_efetivas(o, stacks) for o in restantes)
+            )
+            if not onda:
+                # Ciclo inesperado: remove o restante de uma vez
+                onda = sorted(restantes)
+            ondas.append(onda)
+            restantes -= set(onda)
+        return ondas
+
 class DNSConfigGenerator:
     """Gerador de configuração DNS para Cloudflare"""
     
@@ -247,6 +458,9 @@ class DNSConfigGenerator:
         for stack in stacks:
             stack_info = STACK_CONFIG.get(stack, {})
             prefixo = prefixos_customizados.get(stack, stack_info.get("prefixo", stack))
+            if prefixo is None:
+                # Stack sem interface web (ex.: registry)
+                continue
             
             config_lines.append(f"   - Nome: {prefixo}")
             config_lines.append(f"     Conteúdo: @")
@@ -270,7 +484,8 @@ class DNSConfigGenerator:
         for stack in stacks:
             stack_info = STACK_CONFIG.get(stack, {})
             prefixo = prefixos_customizados.get(stack, stack_info.get("prefixo", stack))
-            config_lines.append(f"- {stack_info.get('descricao', stack)}: https://{prefixo}.{dominio_base}")
+            if prefixo is not None:
+                config_lines.append(f"- {stack_info.get('descricao', stack)}: https://{prefixo}.{dominio_base}")
             
             if "prefixo_console" in stack_info:
                 prefixo_console = prefixos_customizados.get(f"{stack}_console", stack_info["prefixo_console"])
@@ -288,11 +503,979 @@ class DNSConfigGenerator:
         
         return "\n".join(config_lines)
 
+class CloudflareDNS:
+    """Atualização dos registros DNS via API do Cloudflare"""
+
+    API = "https://api.cloudflare.com/client/v4"
+
+    def __init__(self, email: str, api_key: str):
+        self.headers = {"X-Auth-Email": email, "X-Auth-Key": api_key, "Content-Type": "application/json"}
+
+    def _zona(self, dominio: str) -> Optional[str]:
+        partes = dominio.split(".")
+        for i in range(len(partes) - 1):
+            resp = requests.get(f"{self.API}/zones", headers=self.headers,
+                                params={"name": ".".join(partes[i:])}, timeout=15)
+            resp.raise_for_status()
+            if resp.json()["result"]:
+                return resp.json()["result"][0]["id"]
+        return None
+
+    def apontar_registro_a(self, dominio: str, ip: str) -> bool:
+        """Aponta o registro A do domínio base para o novo IP (os CNAMEs seguem o @)"""
+        zona = self._zona(dominio)
+        if not zona:
+            print(f"[ERRO] Zona do domínio {dominio} não encontrada no Cloudflare")
+            return False
+        resp = requests.get(f"{self.API}/zones/{zona}/dns_records", headers=self.headers,
+                            params={"type": "A", "name": dominio}, timeout=15)
+        resp.raise_for_status()
+        registros = resp.json()["result"]
+        payload = {"type": "A", "name": dominio, "content": ip, "ttl": 60, "proxied": False}
+        if registros:
+            resp = requests.put(f"{self.API}/zones/{zona}/dns_records/{registros[0]['id']}",
+                                headers=self.headers, json=payload, timeout=15)
+        else:
+            resp = requests.post(f"{self.API}/zones/{zona}/dns_records",
+                                 headers=self.headers, json=payload, timeout=15)
+        resp.raise_for_status()
+        print(f"[OK] Registro A de {dominio} apontado para {ip}")
+        return True
+
+class TraefikRoutes:
+    """Rotas do Traefik no modo file-provider (sem polling do Docker socket)"""
+
+    # Diretório do host montado no Traefik (fixado no manager): o file provider observa o diretório
+    # e recarrega as rotas sem reiniciar o serviço
+    DIRETORIO_HOST = "/etc/vps-installer/traefik"
+    DIRETORIO_DINAMICO = "/etc/traefik/dynamic"
+    ARQUIVO = "dynamic.yml"
+
+    # Chaves das labels (minúsculas) e seu nome canônico no arquivo dinâmico
+    CHAVES_CANONICAS = {
+        "entrypoints": "entryPoints",
+        "certresolver": "certResolver",
+        "loadbalancer": "loadBalancer",
+        "minresponsebodybytes": "minResponseBodyBytes",
+        "initialinterval": "initialInterval",
+        "passhostheader": "passHostHeader",
+    }
+
+    def __init__(self, config_manager: ConfigManager):
+        self.config_manager = config_manager
+
+    @staticmethod
+    def _valor(valor: str):
+        if valor.isdigit():
+            return int(valor)
+        if valor in ("true", "false"):
+            return valor == "true"
+        return valor
+
+    @classmethod
+    def extrair_rotas(cls, stack_name: str, yaml_content: str) -> Dict[str, Dict]:
+        """Converte as labels traefik.http.* de um YAML renderizado em configuração dinâmica"""
+        rotas = {"routers": {}, "services": {}, "middlewares": {}}
+        servico_atual = None
+        em_services = False
+        portas: Dict[str, Dict[str, int]] = {}
+        routers_do_servico: Dict[str, List[str]] = {}
+
+        for linha in yaml_content.splitlines():
+            if re.match(r"^\S", linha):
+                em_services = linha.startswith("services:")
+                servico_atual = None
+                continue
+            if not em_services:
+                continue
+            match = re.match(r"^  ([\w.-]+):\s*$", linha)
+            if match:
+                servico_atual = match.group(1)
+                continue
+            match = re.match(r"^\s+- traefik\.http\.(routers|services|middlewares)\.([\w-]+)\.(\S+?)=(.*)$", linha)
+            if not match or not servico_atual:
+                continue
+            tipo, nome, chave, valor = match.groups()
+            valor = valor.strip()
+
+            if tipo == "services":
+                if chave == "loadbalancer.server.port":
+                    portas.setdefault(servico_atual, {})[nome] = int(valor)
+                continue
+
+            destino = rotas[tipo].setdefault(nome, {})
+            if tipo == "routers":
+                routers_do_servico.setdefault(servico_atual, [])
+                if nome not in routers_do_servico[servico_atual]:
+                    routers_do_servico[servico_atual].append(nome)
+            partes = [cls.CHAVES_CANONICAS.get(p, p) for p in chave.split(".")]
+            for parte in partes[:-1]:
+                destino = destino.setdefault(parte, {})
+            if partes[-1] == "entryPoints":
+                destino[partes[-1]] = valor.split(",")
+            elif tipo == "middlewares" and len(partes) == 1:
+                # Ex.: traefik.http.middlewares.compress.compress=true
+                destino.setdefault(partes[-1], {})
+            else:
+                destino[partes[-1]] = cls._valor(valor)
+
+        # Services com URL explícita do serviço Swarm; serviços Swarm que declaram o mesmo service
+        # do Traefik (ex.: minio1..N no MinIO distribuído) entram como servidores do mesmo balanceador
+        for servico, servicos_traefik in portas.items():
+            for nome, porta in servicos_traefik.items():
+                balanceador = rotas["services"].setdefault(nome, {"loadBalancer": {"servers": []}})
+                balanceador["loadBalancer"]["servers"].append({"url": f"http://{stack_name}_{servico}:{porta}"})
+            # Router sem service explícito usa o service definido no mesmo bloco
+            if len(servicos_traefik) == 1:
+                nome_service = next(iter(servicos_traefik))
+                for router in routers_do_servico.get(servico, []):
+                    rotas["routers"][router].setdefault("service", nome_service)
+
+        return rotas
+
+    @classmethod
+    def _yaml(cls, valor, nivel: int = 0) -> List[str]:
+        """Serializa dicts/listas simples em YAML"""
+        indent = "  " * nivel
+        linhas = []
+        if isinstance(valor, dict):
+            for chave, item in valor.items():
+                if isinstance(item, (dict, list)) and item:
+                    linhas.append(f"{indent}{chave}:")
+                    linhas.extend(cls._yaml(item, nivel + 1))
+                elif isinstance(item, dict):
+                    linhas.append(f"{indent}{chave}: {{}}")
+                else:
+                    linhas.append(f"{indent}{chave}: {json.dumps(item)}")
+        elif isinstance(valor, list):
+            for item in valor:
+                if isinstance(item, dict):
+                    sub = cls._yaml(item, nivel + 1)
+                    linhas.append(f"{indent}- {sub[0].strip()}")
+                    linhas.extend(sub[1:])
+                else:
+                    linhas.append(f"{indent}- {json.dumps(item)}")
+        return linhas
+
+    def gerar_dynamic_yaml(self, rotas_por_stack: Dict[str, Dict]) -> str:
+        http = {"routers": {}, "services": {}, "middlewares": {}}
+        for stack in sorted(rotas_por_stack):
+            for tipo in http:
+                http[tipo].update(rotas_por_stack[stack].get(tipo, {}))
+        http = {tipo: itens for tipo, itens in http.items() if itens}
+        linhas = ["# Gerado pelo instalador VPS - não editar manualmente"]
+        linhas.extend(self._yaml({"http": http}))
+        return "\n".join(linhas) + "\n"
+
+    @classmethod
+    def preparar_diretorio(cls):
+        """Diretório do bind mount: o Swarm não inicia a tarefa se a origem não existir"""
+        os.makedirs(cls.DIRETORIO_HOST, mode=0o755, exist_ok=True)
+
+    def atualizar(self, novas_rotas: Dict[str, Dict], remover: Optional[List[str]] = None) -> str:
+        """Atualiza incrementalmente as rotas e regrava o arquivo dinâmico observado pelo Traefik"""
+        rotas = self.config_manager.load_traefik_routes()
+        rotas.update(novas_rotas)
+        for stack in remover or []:
+            rotas.pop(stack, None)
+        self.config_manager.save_traefik_routes(rotas)
+
+        conteudo = self.gerar_dynamic_yaml(rotas)
+        self.preparar_diretorio()
+        caminho = os.path.join(self.DIRETORIO_HOST, self.ARQUIVO)
+        try:
+            with open(caminho) as f:
+                if f.read() == conteudo:
+                    print("[i] Rotas do Traefik inalteradas")
+                    return caminho
+        except OSError:
+            pass
+        # Troca atômica: o Traefik nunca lê um arquivo pela metade
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w") as f:
+            f.write(conteudo)
+        os.replace(temporario, caminho)
+        print(f"[OK] Rotas do Traefik atualizadas ({caminho})")
+        return caminho
+
+class PostgresProvisioner:
+    """Gera e aplica o SQL de inicialização do PostgreSQL a partir das stacks selecionadas"""
+
+    SERVICO = "postgres_postgres"
+
+    def __init__(self, config_manager: ConfigManager):
+        self.config_manager = config_manager
+
+    @staticmethod
+    def bancos(stacks: List[str]) -> List[Dict]:
+        return [STACK_CONFIG[s]["banco_postgres"] for s in sorted(stacks)
+                if "banco_postgres" in STACK_CONFIG.get(s, {})]
+
+    @staticmethod
+    def chave_senha(banco: Dict) -> str:
+        return f"{banco['nome']}_db_password"
+
+    def _sql_roles(self, bancos: List[Dict]) -> List[str]:
+        """Um role por aplicação com limites próprios, criados numa única transação"""
+        config = self.config_manager.load_config()
+        linhas = ["BEGIN;"]
+        for banco in bancos:
+            role = banco["nome"]
+            senha = config.get(self.chave_senha(banco), "")
+            linhas.extend([
+                f"DO $$ BEGIN IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = '{role}') "
+                f"THEN CREATE ROLE \"{role}\" LOGIN; END IF; END $$;",
+                f"ALTER ROLE \"{role}\" WITH LOGIN NOSUPERUSER NOCREATEROLE PASSWORD '{senha}' "
+                f"CONNECTION LIMIT {banco.get('limite_conexoes', -1)};",
+            ])
+            for parametro in ("statement_timeout", "idle_in_transaction_session_timeout"):
+                if banco.get(parametro):
+                    linhas.append(f"ALTER ROLE \"{role}\" SET {parametro} = '{banco[parametro]}';")
+        linhas.append("COMMIT;")
+        return linhas
+
+    def _sql_replicacao(self) -> List[str]:
+        """Role de replicação e um slot físico por réplica; slots de réplicas removidas são descartados"""
+        config = self.config_manager.load_config()
+        if "postgres_replicas_nos" not in config:
+            return []
+        slots = [f"'{slot}'" for slot in PostgresStack.slots_replicas(config)]
+        lista = f"ARRAY[{', '.join(slots)}]::text[]"
+        linhas = []
+        if slots:
+            linhas.extend([
+                "DO $$ BEGIN IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'replicador') "
+                "THEN CREATE ROLE replicador REPLICATION LOGIN; END IF; END $$;",
+                f"ALTER ROLE replicador WITH REPLICATION LOGIN PASSWORD '{config.get('postgres_replicacao_password', '')}';",
+                # Reserva WAL desde a criação: o pg_basebackup da réplica começa do slot
+                f"SELECT pg_create_physical_replication_slot(s, true) FROM unnest({lista}) s "
+                "WHERE s NOT IN (SELECT slot_name FROM pg_replication_slots);",
+            ])
+        # Slot sem réplica retém WAL indefinidamente
+        linhas.append(f"SELECT pg_drop_replication_slot(slot_name) FROM pg_replication_slots "
+                      f"WHERE slot_name LIKE 'replica\\_%' AND slot_name <> ALL({lista}) AND NOT active;")
+        return linhas
+
+    def gerar_sql(self, stacks: List[str]) -> str:
+        """SQL idempotente executado numa única sessão psql"""
+        bancos = self.bancos(stacks)
+        linhas = [f"-- Gerado pelo instalador VPS para as stacks: {', '.join(sorted(stacks)) or '-'}"]
+        linhas.extend(self._sql_replicacao())
+        if not bancos:
+            return "\n".join(linhas) + "\n"
+
+        linhas.extend(self._sql_roles(bancos))
+
+        # CREATE DATABASE não roda dentro de transação: \gexec executa todos em lote
+        selects = [
+            f"SELECT 'CREATE DATABASE \"{b['nome']}\" OWNER \"{b['nome']}\"' "
+            f"WHERE NOT EXISTS (SELECT 1 FROM pg_database WHERE datname = '{b['nome']}')"
+            for b in bancos
+        ]
+        linhas.append("\nUNION ALL\n".join(selects) + "\\gexec")
+
+        for banco in bancos:
+            nome = banco["nome"]
+            linhas.append(f"\\connect \"{nome}\"")
+            linhas.append("BEGIN;")
+            linhas.extend(f"CREATE EXTENSION IF NOT EXISTS \"{ext}\";" for ext in banco["extensoes"])
+            # Bancos criados antes dos roles dedicados pertencem ao postgres: as migrations do app
+            # (ALTER TABLE, DROP INDEX) exigem ser dono dos objetos, não basta GRANT
+            linhas.extend([
+                f"ALTER DATABASE \"{nome}\" OWNER TO \"{nome}\";",
+                f"GRANT ALL ON SCHEMA public TO \"{nome}\";",
+                self._sql_transferir_objetos(nome),
+                "COMMIT;",
+            ])
+        return "\n".join(linhas) + "\n"
+
+    @staticmethod
+    def _sql_transferir_objetos(role: str) -> str:
+        """ALTER ... OWNER TO por objeto do postgres (REASSIGN OWNED não se aplica ao superusuário inicial)"""
+        # Membros de extensões ficam com o postgres; sequências ligadas a colunas acompanham a tabela
+        return f"""DO $$ DECLARE r record; BEGIN
+  FOR r IN
+    SELECT format('ALTER %s %s OWNER TO %I',
+                  CASE c.relkind WHEN 'S' THEN 'SEQUENCE' WHEN 'v' THEN 'VIEW'
+                                 WHEN 'm' THEN 'MATERIALIZED VIEW' WHEN 'f' THEN 'FOREIGN TABLE'
+                                 ELSE 'TABLE' END,
+                  c.oid::regclass, '{role}') AS comando
+    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind IN ('r', 'p', 'S', 'v', 'm', 'f')
+      AND n.nspname NOT IN ('pg_catalog', 'information_schema') AND n.nspname NOT LIKE 'pg_toast%'
+      AND c.relowner = 'postgres'::regrole
+      AND NOT EXISTS (SELECT 1 FROM pg_depend d WHERE d.classid = 'pg_class'::regclass AND d.objid = c.oid
+                      AND (d.deptype = 'e' OR (c.relkind = 'S' AND d.deptype IN ('a', 'i'))))
+    UNION ALL
+    SELECT format('ALTER ROUTINE %s OWNER TO %I', p.oid::regprocedure, '{role}')
+    FROM pg_proc p JOIN pg_namespace n ON n.oid = p.pronamespace
+    WHERE n.nspname NOT IN ('pg_catalog', 'information_schema') AND p.proowner = 'postgres'::regrole
+      AND NOT EXISTS (SELECT 1 FROM pg_depend d WHERE d.classid = 'pg_proc'::regclass AND d.objid = p.oid
+                      AND d.deptype = 'e')
+    UNION ALL
+    SELECT format('ALTER TYPE %s OWNER TO %I', t.oid::regtype, '{role}')
+    FROM pg_type t JOIN pg_namespace n ON n.oid = t.typnamespace
+    WHERE t.typtype IN ('e', 'd') AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+      AND t.typowner = 'postgres'::regrole
+      AND NOT EXISTS (SELECT 1 FROM pg_depend d WHERE d.classid = 'pg_type'::regclass AND d.objid = t.oid
+                      AND d.deptype = 'e')
+  LOOP
+    EXECUTE r.comando;
+  END LOOP;
+END $$;"""
+
+    def _container(self) -> Optional[str]:
+        result = subprocess.run(
+            ["docker", "ps", "-q", "--filter", f"label=com.docker.swarm.service.name={self.SERVICO}"],
+            capture_output=True, text=True
+        )
+        ids = result.stdout.split()
+        return ids[0] if ids else None
+
+    def aplicar(self, stacks: List[str], timeout: int = 60) -> bool:
+        """Aplica o SQL na instância em execução (bancos criados após o primeiro boot)"""
+        for _ in range(timeout):
+            container = self._container()
+            if container and subprocess.run(
+                ["docker", "exec", container, "pg_isready", "-U", "postgres"],
+                capture_output=True
+            ).returncode == 0:
+                break
+            time.sleep(1)
+        else:
+            print("[AVISO] PostgreSQL não ficou pronto para provisionar os bancos")
+            return False
+
+        result = subprocess.run(
+            ["docker", "exec", "-i", container, "psql", "-v", "ON_ERROR_STOP=1", "-q",
+             "-U", "postgres", "-d", "postgres", "-f", "-"],
+            input=self.gerar_sql(stacks), capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(f"[AVISO] Falha ao provisionar bancos: {result.stderr.strip()}")
+            return False
+        print(f"[OK] Bancos provisionados: {', '.join(b['nome'] for b in self.bancos(stacks)) or 'nenhum'}")
+        return True
+
+class StackTeardown:
+    """Remoção de stacks em ordem reversa de dependências com coleta de recursos órfãos"""
+
+    def __init__(self, config_manager: ConfigManager, max_paralelo: int = 4, timeout: int = 180):
+        self.config_manager = config_manager
+        self.max_paralelo = max_paralelo
+        self.timeout = timeout
+
+    @staticmethod
+    def stacks_instaladas() -> List[str]:
+        result = subprocess.run(["docker", "stack", "ls", "--format", "{{.Name}}"],
+                              capture_output=True, text=True)
+        return result.stdout.split()
+
+    @staticmethod
+    def _restantes(stack_name: str) -> int:
+        """Quantidade de serviços e containers que ainda pertencem à stack"""
+        filtro = f"label=com.docker.stack.namespace={stack_name}"
+        servicos = subprocess.run(["docker", "service", "ls", "-q", "--filter", filtro],
+                                capture_output=True, text=True)
+        containers = subprocess.run(["docker", "ps", "-aq", "--filter", filtro],
+                                  capture_output=True, text=True)
+        return len(servicos.stdout.split()) + len(containers.stdout.split())
+
+    def _remover_stack(self, stack_name: str) -> Tuple[str, bool, float]:
+        inicio = time.time()
+        subprocess.run(["docker", "stack", "rm", stack_name], capture_output=True)
+        while time.time() - inicio < self.timeout:
+            if self._restantes(stack_name) == 0:
+                return stack_name, True, time.time() - inicio
+            time.sleep(1)
+        return stack_name, False, time.time() - inicio
+
+    def remover(self, stacks: List[str], gc: bool = False) -> bool:
+        """Remove as stacks onda por onda, drenando as independentes em paralelo"""
+        sucesso = True
+        removidas = []
+        for onda in DependencyManager.removal_order(stacks):
+            print(f"[+] Removendo: {', '.join(onda)}")
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_paralelo, len(onda)))) as executor:
+                for stack_name, ok, duracao in executor.map(self._remover_stack, onda):
+                    if ok:
+                        removidas.append(stack_name)
+                        print(f"[OK] Stack {stack_name} removida ({duracao:.1f}s)")
+                    else:
+                        sucesso = False
+                        print(f"[AVISO] Stack {stack_name} ainda tem tarefas após {self.timeout}s")
+
+        config = self.config_manager.load_config()
+        if "stacks" in config:
+            config["stacks"] = [s for s in config["stacks"] if s not in removidas]
+            self.config_manager.save_config(config)
+        if config.get("traefik_routing") == "file" and "traefik" not in removidas:
+            TraefikRoutes(self.config_manager).atualizar({}, remover=removidas)
+
+        if gc and removidas:
+            self.coletar_orfaos(removidas)
+        return sucesso
+
+    def coletar_orfaos(self, removidas: List[str]):
+        """Remove volumes, configs e redes das stacks removidas que nenhuma stack restante usa"""
+        restantes = [s for s in self.stacks_instaladas() if s not in removidas]
+        em_uso = {"volumes": set(), "networks": set()}
+        for stack_name in restantes:
+            info = STACK_CONFIG.get(stack_name, {})
+            em_uso["volumes"].update(info.get("volumes", []))
+            em_uso["networks"].update(info.get("networks", []))
+
+        for tipo, comando in (("volumes", "volume"), ("networks", "network")):
+            candidatos = set()
+            for stack_name in removidas:
+                candidatos.update(STACK_CONFIG.get(stack_name, {}).get(tipo, []))
+            for nome in sorted(candidatos - em_uso[tipo]):
+                result = subprocess.run(["docker", comando, "rm", nome], capture_output=True, text=True)
+                if result.returncode == 0:
+                    print(f"[-] {comando.capitalize()} '{nome}' removido(a)")
+
+        # Só configs das stacks removidas (todas as versões); configs do operador e as versões
+        # anteriores que outras stacks usam para rollback ficam. Configs em uso são recusadas pelo Docker
+        fixos, bases = set(), set()
+        for stack_name in removidas:
+            fixos_stack, bases_stack = self._configs_da_stack(stack_name)
+            fixos |= fixos_stack
+            bases |= bases_stack
+        for stack_name in restantes:
+            fixos_stack, bases_stack = self._configs_da_stack(stack_name)
+            fixos -= fixos_stack
+            bases -= bases_stack
+        result = subprocess.run(["docker", "config", "ls", "--format", "{{.Name}}"],
+                              capture_output=True, text=True)
+        for nome in result.stdout.split():
+            versionada = re.fullmatch(r"(.+)_[0-9a-f]{8}", nome)
+            if nome not in fixos and not (versionada and versionada.group(1) in bases):
+                continue
+            if subprocess.run(["docker", "config", "rm", nome], capture_output=True).returncode == 0:
+                print(f"[-] Config '{nome}' removida")
+        StackCommand.invalidar_inventario()
+
+    def _configs_da_stack(self, stack_name: str) -> Tuple[set, set]:
+        """Nomes fixos e prefixos das configs versionadas que a stack declara no YAML"""
+        fixos = set(STACK_CONFIG.get(stack_name, {}).get("configs", []))
+        bases = set()
+        stack_class = STACK_CLASSES.get(stack_name)
+        if not stack_class:
+            return fixos, bases
+        config = self.config_manager.load_config()
+        try:
+            yaml_content = stack_class(self.config_manager).generate_yaml(
+                config.get("dominio_base", ""), config.get("prefixos", {}))
+        except Exception:
+            return fixos, bases
+        secao = re.search(r"^configs:\n((?:[ \t].*\n?|\n)*)", yaml_content, re.MULTILINE)
+        for nome in re.findall(r"^  ([\w.-]+):", secao.group(1) if secao else "", re.MULTILINE):
+            versionada = re.fullmatch(r"(.+)_[0-9a-f]{8}", nome)
+            if versionada:
+                bases.add(versionada.group(1))
+            else:
+                fixos.add(nome)
+        return fixos, bases
+
+class StackDashboard:
+    """Painel de status ao vivo: quatro consultas em lote por atualização, independente do nº de serviços"""
+
+    # Estados de tarefa que contam como falha; um shutdown só conta quando traz erro
+    ESTADOS_FALHA = {"failed", "rejected"}
+
+    @staticmethod
+    def _json_linhas(comando: List[str]) -> List[Dict]:
+        result = subprocess.run(comando, capture_output=True, text=True)
+        return [json.loads(linha) for linha in result.stdout.splitlines() if linha.strip()]
+
+    def coletar(self) -> Dict:
+        """Serviços, tarefas (com histórico) e consumo dos containers locais, consultados em paralelo"""
+        consultas = {
+            "servicos": ["docker", "service", "ls", "--format", "{{json .}}"],
+            "stats": ["docker", "stats", "--no-stream", "--format", "{{json .}}"],
+        }
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futuros = {nome: executor.submit(self._json_linhas, cmd) for nome, cmd in consultas.items()}
+            servicos = futuros["servicos"].result()
+            # Um único `service ps` com todos os IDs lista as tarefas; um único inspect traz ServiceID e estado
+            ids = [s["ID"] for s in servicos]
+            result = subprocess.run(["docker", "service", "ps", "-q", "--no-trunc"] + ids,
+                                  capture_output=True, text=True) if ids else None
+            tarefas_ids = result.stdout.split() if result else []
+            tarefas = self._json_linhas(["docker", "inspect", "--type", "task", "--format", "{{json .}}"]
+                                        + tarefas_ids) if tarefas_ids else []
+            stats = futuros["stats"].result()
+
+        por_servico = {}
+        por_id = {}
+        for servico in servicos:
+            stack_name = servico["Name"].split("_", 1)[0]
+            por_servico[servico["Name"]] = por_id[servico["ID"]] = {
+                "stack": stack_name, "replicas": servico["Replicas"], "imagem": servico["Image"],
+                "reinicios": 0, "erro": "", "cpu": 0.0, "memoria": 0.0,
+            }
+        for tarefa in tarefas:
+            # `service ls` mostra o ID abreviado; o ServiceID da tarefa é completo
+            service_id = tarefa.get("ServiceID", "")
+            item = next((v for k, v in por_id.items() if service_id.startswith(k)), None)
+            if not item:
+                continue
+            status = tarefa.get("Status", {})
+            erro = status.get("Err", "")
+            if status.get("State") in self.ESTADOS_FALHA or (status.get("State") == "shutdown" and erro):
+                item["reinicios"] += 1
+                if erro and not item["erro"]:
+                    item["erro"] = erro
+        for stat in stats:
+            item = por_servico.get(stat["Name"].split(".", 1)[0])
+            if not item:
+                continue
+            item["cpu"] += float(stat["CPUPerc"].rstrip("%") or 0)
+            item["memoria"] += self._mib(stat["MemUsage"].split("/")[0].strip())
+        return por_servico
+
+    @staticmethod
+    def _mib(valor: str) -> float:
+        unidades = {"B": 1 / 1048576, "KiB": 1 / 1024, "kB": 1 / 1024, "MiB": 1, "MB": 1,
+                    "GiB": 1024, "GB": 1024, "TiB": 1048576}
+        match = re.match(r"([\d.]+)\s*([A-Za-z]+)", valor)
+        if not match:
+            return 0.0
+        return float(match.group(1)) * unidades.get(match.group(2), 1)
+
+    def renderizar(self, por_servico: Dict) -> str:
+        linhas = [f"{'SERVIÇO':<36} {'RÉPLICAS':<10} {'REINÍCIOS':>9} {'CPU%':>7} {'MEM (MiB)':>10}  ERRO"]
+        stack_atual = None
+        for nome in sorted(por_servico, key=lambda n: (por_servico[n]["stack"], n)):
+            item = por_servico[nome]
+            if item["stack"] != stack_atual:
+                stack_atual = item["stack"]
+                linhas.append(f"\n[{stack_atual}]")
+            replicas = item["replicas"].split(" ", 1)[0]
+            atual, _, desejado = replicas.partition("/")
+            marca = "  " if atual == desejado else "! "
+            linhas.append(f"{marca}{nome:<34} {replicas:<10} {item['reinicios']:>9} "
+                          f"{item['cpu']:>7.1f} {item['memoria']:>10.1f}  {item['erro'][:40]}")
+        return "\n".join(linhas)
+
+    def executar(self, intervalo: float = 2.0, uma_vez: bool = False):
+        """Atualiza a tela a cada `intervalo` segundos até Ctrl+C"""
+        try:
+            while True:
+                inicio = time.time()
+                tela = self.renderizar(self.coletar())
+                if uma_vez:
+                    print(tela)
+                    return
+                print("\033[H\033[2J", end="")
+                print(f"=== STATUS DAS STACKS === {datetime.now().strftime('%H:%M:%S')} "
+                      f"(coleta {time.time() - inicio:.1f}s, Ctrl+C para sair)\n")
+                print(tela)
+                print("\nCPU e memória referem-se às tarefas deste nó.")
+                time.sleep(max(0.0, intervalo - (time.time() - inicio)))
+        except KeyboardInterrupt:
+            print()
+
+class LogAggregator:
+    """Logs de vários serviços mesclados por timestamp, com filtro aplicado durante o streaming"""
+
+    TIMESTAMP = re.compile(r"(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?Z")
+
+    def __init__(self, janela: float = 1.0, max_fila: int = 2000):
+        # Com --follow, linhas ficam até `janela` segundos no buffer para reordenar chegadas fora de ordem
+        self.janela = janela
+        self.max_fila = max_fila
+
+    @staticmethod
+    def servicos_para(alvos: List[str]) -> List[str]:
+        """Resolve categorias (ex.: aplicacao), stacks e serviços para nomes de serviços do Swarm"""
+        result = subprocess.run(["docker", "service", "ls", "--format", "{{.Name}}"],
+                              capture_output=True, text=True)
+        existentes = result.stdout.split()
+        servicos = []
+        for alvo in alvos:
+            stacks = [s for s, info in STACK_CONFIG.items() if info.get("categoria") == alvo] or [alvo]
+            encontrados = [n for n in existentes if n == alvo or n.split("_", 1)[0] in stacks]
+            if not encontrados:
+                print(f"[AVISO] Nenhum serviço encontrado para '{alvo}'")
+            servicos.extend(n for n in encontrados if n not in servicos)
+        return servicos
+
+    @classmethod
+    def _chave(cls, linha: str) -> str:
+        """Timestamp RFC3339Nano normalizado (o Docker omite zeros finais da fração)"""
+        match = cls.TIMESTAMP.search(linha)
+        if not match:
+            return ""
+        return f"{match.group(1)}.{(match.group(2) or '').ljust(9, '0')}"
+
+    def _ler(self, servico: str, comando: List[str], filtro, fila: queue.Queue):
+        processo = subprocess.Popen(comando, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    text=True, errors="replace")
+        try:
+            for linha in processo.stdout:
+                if filtro and not filtro.search(linha):
+                    continue
+                # Fila limitada: leitores bloqueiam (e o docker com eles) se a saída não acompanha
+                fila.put((self._chave(linha), servico, linha.rstrip("\n")))
+        finally:
+            processo.wait()
+            fila.put(None)
+
+    def _mesclar(self, servicos: List[str], base: List[str], filtro, largura: int) -> bool:
+        """Sem --follow cada saída é finita e ordenada: k-way merge com uma linha pendente por serviço"""
+        filas = {servico: queue.Queue(maxsize=self.max_fila) for servico in servicos}
+        for servico, fila in filas.items():
+            threading.Thread(target=self._ler, args=(servico, base + [servico], filtro, fila),
+                             daemon=True).start()
+
+        cabecas = []
+        for fila in filas.values():
+            item = fila.get()
+            if item:
+                heapq.heappush(cabecas, item)
+        try:
+            while cabecas:
+                _, servico, linha = heapq.heappop(cabecas)
+                print(f"{servico:<{largura}} | {linha}")
+                item = filas[servico].get()
+                if item:
+                    heapq.heappush(cabecas, item)
+        except KeyboardInterrupt:
+            print()
+        return True
+
+    def executar(self, alvos: List[str], since: Optional[str] = None, tail: Optional[int] = None,
+                 seguir: bool = False, filtro: Optional[str] = None, ignorar_maiusculas: bool = False) -> bool:
+        servicos = self.servicos_para(alvos)
+        if not servicos:
+            return False
+        regex = re.compile(filtro, re.IGNORECASE if ignorar_maiusculas else 0) if filtro else None
+
+        base = ["docker", "service", "logs", "--timestamps", "--raw"]
+        if since:
+            base += ["--since", since]
+        if tail is not None:
+            base += ["--tail", str(tail)]
+        if seguir:
+            base.append("--follow")
+
+        largura = max(len(s) for s in servicos)
+        if not seguir:
+            return self._mesclar(servicos, base, regex, largura)
+
+        fila = queue.Queue(maxsize=self.max_fila)
+        for servico in servicos:
+            threading.Thread(target=self._ler, args=(servico, base + [servico], regex, fila),
+                             daemon=True).start()
+
+        pendentes = []
+        ativos = len(servicos)
+        try:
+            while ativos:
+                try:
+                    item = fila.get(timeout=self.janela / 2)
+                except queue.Empty:
+                    item = False
+                if item is None:
+                    ativos -= 1
+                elif item:
+                    heapq.heappush(pendentes, (item[0], time.monotonic(), item[1], item[2]))
+                # Emite o que já passou pela janela de reordenação, ou o mais antigo se o buffer encher
+                agora = time.monotonic()
+                while pendentes and (agora - pendentes[0][1] >= self.janela or len(pendentes) > self.max_fila):
+                    _, _, servico, linha = heapq.heappop(pendentes)
+                    print(f"{servico:<{largura}} | {linha}")
+            while pendentes:
+                _, _, servico, linha = heapq.heappop(pendentes)
+                print(f"{servico:<{largura}} | {linha}")
+        except KeyboardInterrupt:
+            print()
+        return True
+
+class DeployPolicy:
+    """Healthchecks e políticas de rolling update aplicadas a todo serviço gerado"""
+
+    # Chave: imagem sem tag, ou "imagem#serviço" quando o serviço precisa de outro teste
+    HEALTHCHECKS = {
+        "traefik": {"test": ["CMD", "traefik", "healthcheck", "--ping"]},
+        "postgres": {"test": ["CMD-SHELL", "pg_isready -U postgres"]},
+        "pgvector/pgvector": {"test": ["CMD-SHELL", "pg_isready -U postgres"]},
+        "redis": {"test": ["CMD-SHELL", "redis-cli ping | grep -qE 'PONG|NOAUTH'"]},
+        "rabbitmq": {"test": ["CMD", "rabbitmq-diagnostics", "-q", "ping"], "start_period": "60s"},
+        "minio/minio": {"test": ["CMD", "mc", "ready", "local"]},
+        "chatwoot/chatwoot#chatwoot-web": {
+            "test": ["CMD-SHELL", "wget -qO- http://127.0.0.1:3000/api > /dev/null || exit 1"],
+            "start_period": "120s",
+        },
+        "chatwoot/chatwoot#chatwoot-worker": {
+            "test": ["CMD-SHELL", "pgrep -f sidekiq > /dev/null || exit 1"],
+            "start_period": "60s",
+        },
+        "directus/directus": {
+            "test": ["CMD-SHELL", "wget -qO- http://127.0.0.1:8055/server/health > /dev/null || exit 1"],
+            "start_period": "60s",
+        },
+        "atendai/evolutionapi": {
+            "test": ["CMD-SHELL", "wget -qO- http://127.0.0.1:8080/ > /dev/null || exit 1"],
+            "start_period": "60s",
+        },
+        "grafana/grafana": {"test": ["CMD-SHELL", "wget -qO- http://127.0.0.1:3000/api/health > /dev/null || exit 1"]},
+        "prom/prometheus": {"test": ["CMD-SHELL", "wget -qO- http://127.0.0.1:9090/-/healthy > /dev/null || exit 1"]},
+        "prom/node-exporter": {"test": ["CMD-SHELL", "wget -qO- http://127.0.0.1:9100/metrics > /dev/null || exit 1"]},
+        "dpage/pgadmin4": {"test": ["CMD-SHELL", "wget -qO- http://127.0.0.1:80/misc/ping > /dev/null || exit 1"]},
+        "amir20/dozzle": {"test": ["CMD", "/dozzle", "healthcheck"]},
+        "registry": {"test": ["CMD-SHELL", "wget -qO- http://127.0.0.1:5000/v2/ > /dev/null || exit 1"]},
+    }
+
+    # Serviços com dados locais exclusivos ou portas em modo host não podem ter duas
+    # tarefas simultâneas: atualizam parando a antiga primeiro
+    IMAGENS_STOP_FIRST = {
+        "traefik", "postgres", "pgvector/pgvector", "redis", "rabbitmq",
+        "minio/minio", "portainer/portainer-ce", "prom/prometheus",
+    }
+
+    @staticmethod
+    def imagem_base(imagem: str) -> str:
+        imagem = imagem.split("@")[0]
+        ultimo = imagem.rsplit("/", 1)[-1]
+        if ":" in ultimo:
+            imagem = imagem[:imagem.rindex(":")]
+        return imagem
+
+    @classmethod
+    def _healthcheck(cls, imagem: str, servico: str) -> List[str]:
+        base = cls.imagem_base(imagem)
+        check = cls.HEALTHCHECKS.get(f"{base}#{servico}", cls.HEALTHCHECKS.get(base))
+        if not check:
+            return []
+        return [
+            "    healthcheck:",
+            f"      test: {json.dumps(check['test'])}",
+            "      interval: 15s",
+            "      timeout: 5s",
+            "      retries: 5",
+            f"      start_period: {check.get('start_period', '30s')}",
+        ]
+
+    @classmethod
+    def _politicas(cls, imagem: str) -> List[str]:
+        ordem = "stop-first" if cls.imagem_base(imagem) in cls.IMAGENS_STOP_FIRST else "start-first"
+        return [
+            "      update_config:",
+            "        parallelism: 1",
+            "        delay: 10s",
+            f"        order: {ordem}",
+            "        failure_action: rollback",
+            "        monitor: 30s",
+            "      rollback_config:",
+            "        parallelism: 1",
+            f"        order: {ordem}",
+            "        failure_action: pause",
+        ]
+
+    @classmethod
+    def _aplicar_servico(cls, servico: str, linhas: List[str]) -> List[str]:
+        imagem = next((l.split(":", 1)[1].strip() for l in linhas if l.startswith("    image:")), "")
+        tem_healthcheck = any(l.startswith("    healthcheck:") for l in linhas)
+        tem_update = any(l.startswith("      update_config:") for l in linhas)
+        saida = []
+        for linha in linhas:
+            saida.append(linha)
+            if linha.startswith("    image:") and not tem_healthcheck:
+                saida.extend(cls._healthcheck(imagem, servico))
+            elif linha.rstrip() == "    deploy:" and not tem_update:
+                saida.extend(cls._politicas(imagem))
+        return saida
+
+    @classmethod
+    def aplicar(cls, yaml_content: str) -> str:
+        saida = []
+        servico = None
+        bloco: List[str] = []
+        em_services = False
+
+        def fechar():
+            if servico is not None:
+                saida.extend(cls._aplicar_servico(servico, bloco))
+
+        for linha in yaml_content.split("\n"):
+            if re.match(r"^\S", linha):
+                fechar()
+                servico, bloco = None, []
+                em_services = linha.startswith("services:")
+                saida.append(linha)
+                continue
+            match = re.match(r"^  ([\w.-]+):\s*$", linha) if em_services else None
+            if match:
+                fechar()
+                servico, bloco = match.group(1), [linha]
+            elif servico is not None:
+                bloco.append(linha)
+            else:
+                saida.append(linha)
+        fechar()
+        return "\n".join(saida)
+
+class ImageLock:
+    """Lock de imagens: cada tag resolvida uma vez para um digest, usado em todos os deploys"""
+
+    MANIFESTOS = ", ".join([
+        "application/vnd.oci.image.index.v1+json",
+        "application/vnd.docker.distribution.manifest.list.v2+json",
+        "application/vnd.oci.image.manifest.v1+json",
+        "application/vnd.docker.distribution.manifest.v2+json",
+    ])
+    ARQUITETURAS = {"x86_64": "amd64", "aarch64": "arm64", "arm64": "arm64"}
+
+    # Compartilhada entre instâncias: renders concorrentes não resolvem nem gravam o lock em duplicidade
+    _trava = threading.Lock()
+    # Tags que falharam neste processo: não são consultadas (nem avisadas) de novo a cada render
+    _falhas: set = set()
+
+    def __init__(self, config_manager: ConfigManager):
+        self.config_manager = config_manager
+
+    @staticmethod
+    def _referencia(imagem: str) -> Tuple[str, str, str]:
+        """(registry, repositório, tag) no formato da API de registry v2"""
+        nome, tag = imagem, "latest"
+        if ":" in imagem.rsplit("/", 1)[-1]:
+            nome, tag = imagem.rsplit(":", 1)
+        partes = nome.split("/", 1)
+        if len(partes) == 2 and ("." in partes[0] or ":" in partes[0] or partes[0] == "localhost"):
+            return partes[0], partes[1], tag
+        return "registry-1.docker.io", nome if "/" in nome else f"library/{nome}", tag
+
+    def _get(self, sessao: "requests.Session", url: str, accept: str) -> "requests.Response":
+        resp = sessao.get(url, headers={"Accept": accept}, timeout=30)
+        if resp.status_code == 401 and "Bearer" in resp.headers.get("WWW-Authenticate", ""):
+            # Token anônimo conforme o desafio do registry (Docker Hub, ghcr, gcr...)
+            params = dict(re.findall(r'(\w+)="([^"]*)"', resp.headers["WWW-Authenticate"]))
+            token = requests.get(params.pop("realm"), params=params, timeout=30).json()
+            sessao.headers["Authorization"] = f"Bearer {token.get('token') or token.get('access_token')}"
+            resp = sessao.get(url, headers={"Accept": accept}, timeout=30)
+        resp.raise_for_status()
+        return resp
+
+    def resolver(self, imagem: str) -> Dict:
+        """Digest do manifesto (multi-arquitetura) e camadas da plataforma deste host, sem pull"""
+        registry, repositorio, tag = self._referencia(imagem)
+        base = f"https://{registry}/v2/{repositorio}/manifests"
+        with requests.Session() as sessao:
+            resp = self._get(sessao, f"{base}/{tag}", self.MANIFESTOS)
+            digest = resp.headers.get("Docker-Content-Digest") or \
+                f"sha256:{hashlib.sha256(resp.content).hexdigest()}"
+            manifesto = resp.json()
+            if "manifests" in manifesto:
+                arquitetura = self.ARQUITETURAS.get(os.uname().machine, "amd64")
+                plataforma = next((m for m in manifesto["manifests"]
+                                   if m.get("platform", {}).get("os") == "linux"
+                                   and m["platform"].get("architecture") == arquitetura), manifesto["manifests"][0])
+                manifesto = self._get(sessao, f"{base}/{plataforma['digest']}", plataforma["mediaType"]).json()
+        camadas = {c["digest"]: c.get("size", 0) for c in manifesto.get("layers", [])}
+        return {"digest": digest, "camadas": camadas, "resolvido": datetime.now().isoformat(timespec="seconds")}
+
+    def fixar(self, yaml_content: str, resolver: bool = True) -> str:
+        """Troca `image: tag` por `image: tag@digest`, resolvendo (uma vez) as tags ainda fora do lock"""
+        if self.config_manager.load_config().get("offline"):
+            # `docker load` não preserva RepoDigests: referências por digest não casariam com as imagens locais
+            return yaml_content
+        padrao = re.compile(r"^(\s+image:\s*)([^\s@]+)\s*$", re.MULTILINE)
+        imagens = {m[1] for m in padrao.findall(yaml_content)}
+        with self._trava:
+            lock = self.config_manager.load_image_lock()
+            faltando = sorted(i for i in imagens if i not in lock["imagens"] and i not in self._falhas) \
+                if resolver else []
+            if faltando:
+                with ThreadPoolExecutor(max_workers=min(8, len(faltando))) as executor:
+                    for imagem, futuro in [(i, executor.submit(self.resolver, i)) for i in faltando]:
+                        try:
+                            lock["imagens"][imagem] = futuro.result()
+                        except Exception as e:
+                            self._falhas.add(imagem)
+                            print(f"[AVISO] Não foi possível resolver o digest de {imagem}: {e}")
+                self.config_manager.save_image_lock(lock)
+
+        def trocar(match):
+            entrada = lock["imagens"].get(match.group(2))
+            if not entrada:
+                return match.group(0)
+            return f"{match.group(1)}{match.group(2)}@{entrada['digest']}"
+        return padrao.sub(trocar, yaml_content)
+
+    def atualizar(self, imagens: Optional[List[str]] = None, aplicar: bool = True) -> List[str]:
+        """Re-resolve o lock, mostra o volume a baixar por imagem e retorna as que mudaram"""
+        lock = self.config_manager.load_image_lock()
+        imagens = sorted(imagens or lock["imagens"])
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(imagens)))) as executor:
+            novos = dict(zip(imagens, executor.map(self._resolver_seguro, imagens)))
+
+        alteradas = []
+        total = 0
+        print(f"\n{'IMAGEM':<44} {'ATUAL':<14} {'NOVO':<14} {'A BAIXAR':>10}")
+        for imagem in imagens:
+            novo = novos[imagem]
+            atual = lock["imagens"].get(imagem)
+            if not novo:
+                print(f"{imagem:<44} {'?':<14} {'erro':<14} {'-':>10}")
+                continue
+            if atual and atual["digest"] == novo["digest"]:
+                continue
+            # Só as camadas que a versão atual não tem precisam ser baixadas
+            existentes = set(atual["camadas"]) if atual else set()
+            tamanho = sum(t for d, t in novo["camadas"].items() if d not in existentes)
+            total += tamanho
+            alteradas.append(imagem)
+            print(f"{imagem:<44} {(atual['digest'][7:19] if atual else '-'):<14} "
+                  f"{novo['digest'][7:19]:<14} {tamanho / 1048576:>8.1f}MB")
+        print(f"\n{len(alteradas)} imagem(ns) com nova versão, {total / 1048576:.1f} MB a baixar por nó")
+
+        if aplicar and alteradas:
+            for imagem in alteradas:
+                lock["imagens"][imagem] = novos[imagem]
+            lock["atualizado"] = datetime.now().isoformat(timespec="seconds")
+            self.config_manager.save_image_lock(lock)
+            print(f"[OK] Lock atualizado: {self.config_manager.image_lock_file}")
+        return alteradas
+
+    def _resolver_seguro(self, imagem: str) -> Optional[Dict]:
+        try:
+            return self.resolver(imagem)
+        except Exception as e:
+            print(f"[ERRO] {imagem}: {e}")
+            return None
+
 class StackCommand(ABC):
     """Classe base para comandos de stack"""
+
+    # Nomes existentes por tipo de recurso: um único `docker <tipo> ls` por processo
+    _inventario: Dict[str, set] = {}
+    _trava_inventario = threading.Lock()
     
     def __init__(self, config_manager: ConfigManager):
         self.config_manager = config_manager
+
+    @classmethod
+    def recurso_existe(cls, tipo: str, nome: str) -> bool:
+        with cls._trava_inventario:
+            if tipo not in cls._inventario:
+                result = subprocess.run(["docker", tipo, "ls", "--format", "{{.Name}}"],
+                                      capture_output=True, text=True)
+                cls._inventario[tipo] = set(result.stdout.split())
+            return nome in cls._inventario[tipo]
+
+    @classmethod
+    def registrar_recurso(cls, tipo: str, nome: str):
+        with cls._trava_inventario:
+            if tipo in cls._inventario:
+                cls._inventario[tipo].add(nome)
+
+    @classmethod
+    def invalidar_inventario(cls):
+        """Após remoções fora do fluxo de criação (ex.: coleta de órfãos)"""
+        with cls._trava_inventario:
+            cls._inventario.clear()
         
     @abstractmethod
     def name(self) -> str:
@@ -328,19 +1511,17 @@ class StackCommand(ABC):
             self.create_config(config)
             
     def create_network(self, nome: str, driver: str = "overlay"):
-        result = subprocess.run(["docker", "network", "ls", "--format", "{{.Name}}"], 
-                              capture_output=True, text=True)
-        if nome not in result.stdout.split():
+        if not self.recurso_existe("network", nome):
             subprocess.run(["docker", "network", "create", "--driver", driver, nome], check=True)
+            self.registrar_recurso("network", nome)
             print(f"[+] Network '{nome}' criada")
         else:
             print(f"[i] Network '{nome}' já existe")
             
     def create_volume(self, nome: str):
-        result = subprocess.run(["docker", "volume", "ls", "--format", "{{.Name}}"], 
-                              capture_output=True, text=True)
-        if nome not in result.stdout.split():
+        if not self.recurso_existe("volume", nome):
             subprocess.run(["docker", "volume", "create", nome], check=True)
+            self.registrar_recurso("volume", nome)
             print(f"[+] Volume '{nome}' criado")
         else:
             print(f"[i] Volume '{nome}' já existe")
@@ -348,20 +1529,56 @@ class StackCommand(ABC):
     def create_config(self, nome: str):
         config_path = os.path.join(os.path.dirname(__file__), "stacks", "configs", nome)
         if os.path.exists(config_path):
-            result = subprocess.run(["docker", "config", "ls", "--format", "{{.Name}}"], 
-                                  capture_output=True, text=True)
-            if nome not in result.stdout.split():
+            if not self.recurso_existe("config", nome):
                 subprocess.run(["docker", "config", "create", nome, config_path], check=True)
+                self.registrar_recurso("config", nome)
                 print(f"[+] Config '{nome}' criada")
             else:
                 print(f"[i] Config '{nome}' já existe")
+
+    def post_deploy(self):
+        """Executado após o deploy e a verificação da stack"""
+        pass
+
+    def render(self, dominio_base: str, prefixos: Dict[str, str], resolver_imagens: bool = False) -> str:
+        """YAML final de deploy: template da stack + healthchecks, políticas de update e digests fixados"""
+        # Tags fora do lock só são resolvidas (rede) quando o YAML vai para deploy
+        return ImageLock(self.config_manager).fixar(DeployPolicy.aplicar(self.generate_yaml(dominio_base, prefixos)),
+                                                    resolver=resolver_imagens)
+
+    @staticmethod
+    def id_replica_postgres(no: str) -> str:
+        """Identificador da réplica do PostgreSQL no nó, usado no slot, no volume e no serviço"""
+        # Derivado do hostname: incluir ou remover um nó não renomeia as réplicas dos demais
+        return re.sub(r"[^a-z0-9]+", "_", no.lower()).strip("_")[:50]
+
+    @staticmethod
+    def nome_config_versionada(nome: str, conteudo: str) -> str:
+        return f"{nome}_{hashlib.sha256(conteudo.encode()).hexdigest()[:8]}"
+
+    @staticmethod
+    def create_config_from_content(nome: str, conteudo: str) -> str:
+        """Cria uma Docker config versionada pelo hash do conteúdo e retorna o nome"""
+        nome_versionado = StackCommand.nome_config_versionada(nome, conteudo)
+        if not StackCommand.recurso_existe("config", nome_versionado):
+            subprocess.run(["docker", "config", "create", nome_versionado, "-"],
+                         input=conteudo, text=True, check=True, capture_output=True)
+            StackCommand.registrar_recurso("config", nome_versionado)
+            print(f"[+] Config '{nome_versionado}' criada")
+        else:
+            print(f"[i] Config '{nome_versionado}' já existe")
+        return nome_versionado
                 
     def deploy_via_cli(self, yaml_content: str):
         """Deploy usando Docker CLI"""
         yaml_file = f"{self.name()}.yaml"
         with open(yaml_file, 'w') as f:
             f.write(yaml_content)
-        subprocess.run(["docker", "stack", "deploy", "-c", yaml_file, self.name()], check=True)
+        comando = ["docker", "stack", "deploy", "-c", yaml_file, self.name()]
+        if self.config_manager.load_config().get("offline"):
+            # Imagens vieram do pacote offline: não consultar o registry
+            comando[3:3] = ["--resolve-image", "never"]
+        subprocess.run(comando, check=True)
         print(f"[OK] Stack '{self.name()}' deployada via Docker CLI")
         
     def deploy_via_portainer(self, yaml_content: str, portainer_url: str, username: str, password: str):
@@ -406,53 +1623,156 @@ class StackCommand(ABC):
 
 # Implementação das stacks específicas
 class TraefikStack(StackCommand):
+    # Middlewares globais aplicados a todos os routers do entrypoint websecure
+    # quando o perfil de performance está ativo
+    MIDDLEWARES_PERFORMANCE = ["compress", "retry", "ratelimit"]
+
     def name(self) -> str:
         return "traefik"
-        
+
+    def create_resources(self):
+        super().create_resources()
+        if self.config_manager.load_config().get("traefik_routing") == "file":
+            TraefikRoutes.preparar_diretorio()
+
+    def get_required_resources(self) -> Dict[str, List[str]]:
+        resources = super().get_required_resources()
+        # No perfil de performance o Traefik expõe métricas na rede interna (Prometheus)
+        if self.config_manager.load_config().get("traefik_performance", False):
+            resources["networks"] = resources["networks"] + ["interna"]
+        return resources
+
+    def _comandos_performance(self, provider: str) -> List[str]:
+        """Argumentos estáticos do perfil de performance"""
+        middlewares = ",".join(f"{m}@{provider}" for m in self.MIDDLEWARES_PERFORMANCE)
+        return [
+            "--log.level=WARN",
+            # HTTP/3 (QUIC) no entrypoint websecure
+            "--entrypoints.websecure.http3=true",
+            "--entrypoints.websecure.http3.advertisedport=443",
+            f"--entrypoints.websecure.http.middlewares={middlewares}",
+            # Keep-alive com os clientes
+            "--entrypoints.websecure.transport.respondingTimeouts.idleTimeout=180s",
+            "--entrypoints.websecure.transport.keepAliveMaxRequests=1000",
+            # Conexões ociosas e timeouts com os backends
+            "--serverstransport.maxidleconnsperhost=64",
+            "--serverstransport.forwardingtimeouts.dialtimeout=10s",
+            "--serverstransport.forwardingtimeouts.responseheadertimeout=60s",
+            "--serverstransport.forwardingtimeouts.idleconntimeout=90s",
+            # Métricas Prometheus em entrypoint dedicado (rede interna)
+            "--entrypoints.metrics.address=:8082",
+            "--metrics.prometheus=true",
+            "--metrics.prometheus.entrypoint=metrics",
+            "--metrics.prometheus.addrouterslabels=true",
+            # Access log bufferizado, registrando apenas erros e requisições lentas
+            "--accesslog=true",
+            "--accesslog.bufferingsize=100",
+            "--accesslog.filters.statuscodes=400-599",
+            "--accesslog.filters.minduration=500ms",
+        ]
+
+    def _labels_performance(self) -> List[str]:
+        """Definição dos middlewares globais do perfil de performance"""
+        return [
+            "traefik.http.middlewares.compress.compress=true",
+            "traefik.http.middlewares.compress.compress.minresponsebodybytes=1024",
+            "traefik.http.middlewares.retry.retry.attempts=3",
+            "traefik.http.middlewares.retry.retry.initialinterval=100ms",
+            "traefik.http.middlewares.ratelimit.ratelimit.average=100",
+            "traefik.http.middlewares.ratelimit.ratelimit.burst=200",
+        ]
+
     def generate_yaml(self, dominio_base: str, prefixos: Dict[str, str]) -> str:
         config = self.config_manager.load_config()
         le_email = config.get("le_email", "admin@" + dominio_base)
         cf_email = config.get("cf_email", "")
         cf_api_key = config.get("cf_api_key", "")
+        performance = config.get("traefik_performance", False)
+        modo_file = config.get("traefik_routing") == "file"
         prefixo = prefixos.get("traefik", "traefik")
-        
+
+        if modo_file:
+            # Rotas vêm do arquivo dinâmico gerado pelo instalador (TraefikRoutes)
+            comandos = [
+                f"--providers.file.directory={TraefikRoutes.DIRETORIO_DINAMICO}",
+                "--providers.file.watch=true",
+            ]
+        else:
+            comandos = [
+                "--providers.docker=true",
+                "--providers.docker.swarmMode=true",
+                "--providers.docker.network=externa",
+                "--providers.docker.exposedbydefault=false",
+            ]
+        comandos += [
+            "--entrypoints.web.address=:80",
+            "--entrypoints.web.http.redirections.entrypoint.to=websecure",
+            "--entrypoints.web.http.redirections.entrypoint.scheme=https",
+            "--entrypoints.websecure.address=:443",
+            f"--certificatesresolvers.le.acme.email={le_email}",
+            "--certificatesresolvers.le.acme.storage=/letsencrypt/acme.json",
+            "--certificatesresolvers.le.acme.tlschallenge=true",
+            "--certificatesresolvers.le.acme.httpchallenge.entrypoint=web",
+        ]
+        if cf_email and cf_api_key:
+            comandos.extend([
+                "--certificatesresolvers.le.acme.dnschallenge=true",
+                "--certificatesresolvers.le.acme.dnschallenge.provider=cloudflare",
+            ])
+        comandos.append("--api.dashboard=true")
+        comandos.append("--ping=true")
+        if performance:
+            comandos.extend(self._comandos_performance("file" if modo_file else "docker"))
+        else:
+            comandos.append("--log.level=INFO")
+
+        labels = [
+            "traefik.enable=true",
+            "traefik.docker.network=externa",
+            f"traefik.http.routers.traefik.rule=Host(`{prefixo}.{dominio_base}`)",
+            "traefik.http.routers.traefik.entrypoints=websecure",
+            "traefik.http.routers.traefik.tls.certresolver=le",
+            "traefik.http.routers.traefik.service=api@internal",
+            "traefik.http.services.traefik.loadbalancer.server.port=8080",
+        ]
+        if performance:
+            labels.extend(self._labels_performance())
+
+        porta_http3 = """
+      - target: 443
+        published: 443
+        protocol: udp
+        mode: host""" if performance else ""
+        rede_interna = "\n      - interna" if performance else ""
+        rede_interna_externa = "\n  interna:\n    external: true" if performance else ""
+        comandos_yaml = "\n".join(f"      - {c}" for c in comandos)
+        labels_yaml = "\n".join(f"        - {l}" for l in labels)
+        if modo_file:
+            volume_provider = f"\n      - {TraefikRoutes.DIRETORIO_HOST}:{TraefikRoutes.DIRETORIO_DINAMICO}:ro"
+        else:
+            volume_provider = "\n      - /var/run/docker.sock:/var/run/docker.sock:ro"
+
         return f'''version: "3.8"
 
 services:
   traefik:
     image: traefik:v3.0
     command:
-      - --providers.docker=true
-      - --providers.docker.swarmMode=true
-      - --providers.docker.network=externa
-      - --providers.docker.exposedbydefault=false
-      - --entrypoints.web.address=:80
-      - --entrypoints.web.http.redirections.entrypoint.to=websecure
-      - --entrypoints.web.http.redirections.entrypoint.scheme=https
-      - --entrypoints.websecure.address=:443
-      - --certificatesresolvers.le.acme.email={le_email}
-      - --certificatesresolvers.le.acme.storage=/letsencrypt/acme.json
-      - --certificatesresolvers.le.acme.tlschallenge=true
-      - --certificatesresolvers.le.acme.httpchallenge.entrypoint=web
-      {"- --certificatesresolvers.le.acme.dnschallenge=true" if cf_email and cf_api_key else ""}
-      {"- --certificatesresolvers.le.acme.dnschallenge.provider=cloudflare" if cf_email and cf_api_key else ""}
-      - --api.dashboard=true
-      - --log.level=INFO
+{comandos_yaml}
     ports:
       - target: 80
         published: 80
         mode: host
       - target: 443
         published: 443
-        mode: host
+        mode: host{porta_http3}
     environment:
       CF_API_EMAIL: "{cf_email}"
       CF_API_KEY: "{cf_api_key}"
     volumes:
-      - traefik_certificates:/letsencrypt
-      - /var/run/docker.sock:/var/run/docker.sock:ro
+      - traefik_certificates:/letsencrypt{volume_provider}
     networks:
-      - externa
+      - externa{rede_interna}
     deploy:
       mode: replicated
       replicas: 1
@@ -460,13 +1780,7 @@ services:
         constraints:
           - node.role == manager
       labels:
-        - traefik.enable=true
-        - traefik.docker.network=externa
-        - traefik.http.routers.traefik.rule=Host(`{prefixo}.{dominio_base}`)
-        - traefik.http.routers.traefik.entrypoints=websecure
-        - traefik.http.routers.traefik.tls.certresolver=le
-        - traefik.http.routers.traefik.service=api@internal
-        - traefik.http.services.traefik.loadbalancer.server.port=8080
+{labels_yaml}
 
 volumes:
   traefik_certificates:
@@ -474,7 +1788,7 @@ volumes:
 
 networks:
   externa:
-    external: true
+    external: true{rede_interna_externa}
 '''
 
 class PortainerStack(StackCommand):
@@ -532,30 +1846,148 @@ networks:
 '''
 
 class PostgresStack(StackCommand):
+    # Réplicas de streaming: uma por nó em config["postgres_replicas_nos"]
+    PG_HBA = """local all all trust
+host all all 127.0.0.1/32 trust
+host all all ::1/128 trust
+host replication replicador all scram-sha-256
+host all all all scram-sha-256
+"""
+    SCRIPT_REPLICA = """#!/bin/sh
+# Clona o primário no primeiro boot (volume vazio) e sobe como hot standby
+set -e
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    # Sem PG_VERSION o conteúdo é de um clone interrompido: recomeça do zero
+    mkdir -p "$PGDATA" && find "$PGDATA" -mindepth 1 -delete
+    chown postgres:postgres "$PGDATA" && chmod 700 "$PGDATA"
+    # O healthcheck considera o serviço saudável enquanto o clone não termina
+    touch /tmp/replica-clonando
+    export PGPASSWORD="$REPLICATION_PASSWORD"
+    until psql -h "$PRIMARY_HOST" -U replicador -d postgres -tAc \\
+        "SELECT 1 FROM pg_replication_slots WHERE slot_name = '$REPLICATION_SLOT'" 2>/dev/null | grep -q 1; do
+        echo "Aguardando o slot $REPLICATION_SLOT no primário..."; sleep 3
+    done
+    su-exec postgres pg_basebackup -h "$PRIMARY_HOST" -U replicador -D "$PGDATA/.clone" \\
+        -S "$REPLICATION_SLOT" -X stream -R -c fast
+    # PG_VERSION por último: só um clone completo é reconhecido no próximo boot
+    find "$PGDATA/.clone" -mindepth 1 -maxdepth 1 ! -name PG_VERSION -exec mv {} "$PGDATA"/ \\;
+    mv "$PGDATA/.clone/PG_VERSION" "$PGDATA"/ && rmdir "$PGDATA/.clone"
+    unset PGPASSWORD
+    rm -f /tmp/replica-clonando
+fi
+exec docker-entrypoint.sh postgres -c hot_standby=on -c hot_standby_feedback=on \\
+    -c max_standby_streaming_delay=30s
+"""
+
     def name(self) -> str:
         return "postgres"
+
+    @staticmethod
+    def slots_replicas(config: Dict) -> List[str]:
+        return [f"replica_{StackCommand.id_replica_postgres(no)}" for no in config.get("postgres_replicas_nos", [])]
+
+    def create_resources(self):
+        super().create_resources()
+        if self.config_manager.load_config().get("postgres_replicas_nos"):
+            self.create_config_from_content("pg_hba_postgres", self.PG_HBA)
+            self.create_config_from_content("replica_postgres", self.SCRIPT_REPLICA)
+
+    def post_deploy(self):
+        # Bancos e roles ficam fora do spec do serviço: instalar uma app nova não reinicia o primário
+        config = self.config_manager.load_config()
+        PostgresProvisioner(self.config_manager).aplicar(config.get("stacks", []))
+        # Userlist e pools de leitura do PgBouncer saem do render: roles novos pedem um novo deploy
+        # (configs versionadas pelo conteúdo: sem mudança, o deploy não altera o serviço)
+        if "pgbouncer" in StackTeardown.stacks_instaladas():
+            pgbouncer = STACK_CLASSES["pgbouncer"](self.config_manager)
+            pgbouncer.create_resources()
+            pgbouncer.deploy_via_cli(pgbouncer.render(config.get("dominio_base", ""), config.get("prefixos", {}),
+                                                      resolver_imagens=True))
+
+    def _replicas(self, config: Dict, script: str) -> str:
+        servicos = []
+        for slot, no in zip(self.slots_replicas(config), config.get("postgres_replicas_nos", [])):
+            indice = self.id_replica_postgres(no)
+            servicos.append(f'''
+  postgres-replica-{indice.replace("_", "-")}:
+    image: postgres:15-alpine
+    entrypoint: ["/bin/sh", "/usr/local/bin/replica.sh"]
+    healthcheck:
+      test: ["CMD-SHELL", "[ -f /tmp/replica-clonando ] || pg_isready -U postgres"]
+      interval: 15s
+      timeout: 5s
+      retries: 5
+      start_period: 120s
+    environment:
+      POSTGRES_PASSWORD: {config.get("postgres_password", "")}
+      PRIMARY_HOST: postgres
+      REPLICATION_SLOT: {slot}
+      REPLICATION_PASSWORD: {config.get("postgres_replicacao_password", "")}
+    volumes:
+      - postgres_replica_{indice}_data:/var/lib/postgresql/data
+    configs:
+      - source: {script}
+        target: /usr/local/bin/replica.sh
+        mode: 0555
+    networks:
+      - interna
+    deploy:
+      mode: replicated
+      replicas: 1
+      placement:
+        constraints:
+          - node.hostname == {no}
+''')
+        return "".join(servicos)
         
     def generate_yaml(self, dominio_base: str, prefixos: Dict[str, str]) -> str:
         config = self.config_manager.load_config()
         postgres_password = config.get("postgres_password", self.generate_password())
         prefixo = prefixos.get("postgres", "pgadmin")
+
+        replicacao = comando = configs_extra = replicas = volumes_replicas = ""
+        if config.get("postgres_replicas_nos"):
+            hba = self.nome_config_versionada("pg_hba_postgres", self.PG_HBA)
+            script = self.nome_config_versionada("replica_postgres", self.SCRIPT_REPLICA)
+            # Limite de WAL retido por slot: réplica parada não enche o disco do primário
+            comando = """
+    command:
+      - postgres
+      - -c
+      - hba_file=/etc/postgresql/pg_hba.conf
+      - -c
+      - max_wal_senders=10
+      - -c
+      - max_replication_slots=10
+      - -c
+      - max_slot_wal_keep_size=10GB"""
+            replicacao = f"""
+    configs:
+      - source: {hba}
+        target: /etc/postgresql/pg_hba.conf
+        mode: 0444"""
+            configs_extra = f"""
+
+configs:
+  {hba}:
+    external: true
+  {script}:
+    external: true"""
+            replicas = self._replicas(config, script)
+            volumes_replicas = "".join(f"\n  postgres_replica_{self.id_replica_postgres(no)}_data:"
+                                       for no in config.get("postgres_replicas_nos", []))
         
         return f'''version: "3.8"
 
 services:
   postgres:
-    image: postgres:15-alpine
+    image: postgres:15-alpine{comando}
     environment:
       POSTGRES_USER: postgres
       POSTGRES_PASSWORD: {postgres_password}
       POSTGRES_DB: postgres
     volumes:
-      - postgres_data:/var/lib/postgresql/data
-      - postgres_config:/docker-entrypoint-initdb.d
-    configs:
-      - source: entrypoint_postgres
-        target: /docker-entrypoint-initdb.d/init.sql
-        mode: 0444
+      - postgres_data:/var/lib/postgresql/data{replicacao}
     networks:
       - interna
     deploy:
@@ -564,7 +1996,7 @@ services:
       placement:
         constraints:
           - node.role == manager
-
+{replicas}
   pgadmin:
     image: dpage/pgadmin4:latest
     environment:
@@ -590,13 +2022,7 @@ services:
 volumes:
   postgres_data:
     external: true
-  postgres_config:
-    external: true
-  postgres_pgadmin:
-
-configs:
-  entrypoint_postgres:
-    external: true
+  postgres_pgadmin:{volumes_replicas}{configs_extra}
 
 networks:
   externa:
@@ -669,22 +2095,82 @@ networks:
     def generate_password(self) -> str:
         return ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(16))
 
+class StackRegistry(Mapping):
+    """Classes das stacks por nome; as fábricas de implementações só rodam no primeiro uso"""
+
+    def __init__(self, classes: Dict[str, type], fabricas: List[Callable[[], Dict[str, type]]]):
+        self._classes = dict(classes)
+        self._fabricas = list(fabricas)
+        self._trava = threading.RLock()
+
+    def _carregar(self):
+        with self._trava:
+            while self._fabricas:
+                self._classes.update(self._fabricas.pop(0)())
+
+    def __getitem__(self, nome: str) -> type:
+        if nome not in self._classes:
+            self._carregar()
+        return self._classes[nome]
+
+    def __contains__(self, nome) -> bool:
+        if nome not in self._classes:
+            self._carregar()
+        return nome in self._classes
+
+    def __iter__(self):
+        self._carregar()
+        return iter(self._classes)
+
+    def __len__(self) -> int:
+        self._carregar()
+        return len(self._classes)
+
+
+# Stacks de plugins (plugins/ ou VPS_INSTALLER_PLUGINS): declaradas num único módulo, sem editar este arquivo
+try:
+    from stack_plugins import PluginIndex
+    PLUGINS = PluginIndex(reservados=set(STACK_CONFIG))
+except ImportError:
+    PLUGINS = None
+
+
+def _registrar_plugins():
+    """Metadados dos plugins no catálogo, perfis e políticas de deploy (as classes vêm sob demanda)"""
+    for nome, stack in (PLUGINS.indexar() if PLUGINS else {}).items():
+        STACK_CONFIG[nome] = {"dependencias": [], "volumes": [], "networks": [],
+                              **{k: v for k, v in stack.items() if k not in PluginIndex.CHAVES_PLUGIN}}
+        PERFIS_INSTALACAO["completo"]["stacks"].append(nome)
+        for perfil in stack.get("perfis", []):
+            if perfil in PERFIS_INSTALACAO and nome not in PERFIS_INSTALACAO[perfil]["stacks"]:
+                PERFIS_INSTALACAO[perfil]["stacks"].append(nome)
+        DeployPolicy.HEALTHCHECKS.update(stack.get("healthchecks", {}))
+        DeployPolicy.IMAGENS_STOP_FIRST.update(stack.get("stop_first", []))
+
+
+def _implementacoes_plugins() -> Dict[str, type]:
+    return PLUGINS.classes(StackCommand) if PLUGINS else {}
+
+
+def _implementacoes_adicionais() -> Dict[str, type]:
+    """Implementações de stack_implementations.py, importado só quando alguma delas é usada"""
+    try:
+        from stack_implementations import create_stack_implementations
+    except ImportError:
+        # Se o arquivo não existir, usar apenas as implementações básicas
+        return {}
+    return create_stack_implementations(StackCommand)
+
+
 # Mapeamento de stacks para suas classes
-STACK_CLASSES = {
+STACK_CLASSES = StackRegistry({
     "traefik": TraefikStack,
     "portainer": PortainerStack,
     "postgres": PostgresStack,
     "redis": RedisStack,
-}
+}, [_implementacoes_adicionais, _implementacoes_plugins])
 
-# Importar implementações adicionais de todas as stacks
-try:
-    from stack_implementations import create_stack_implementations
-    additional_stacks = create_stack_implementations(StackCommand)
-    STACK_CLASSES.update(additional_stacks)
-except ImportError:
-    # Se o arquivo não existir, usar apenas as implementações básicas
-    pass
+_registrar_plugins()
 
 class VPSInstaller:
     """Classe principal do instalador"""
@@ -693,6 +2179,17 @@ class VPSInstaller:
         self.config_manager = ConfigManager()
         self.dependency_manager = DependencyManager()
         self.dns_generator = DNSConfigGenerator()
+        # Manifesto de instalação não interativa (modo frota); None = perguntar ao usuário
+        self.manifesto: Optional[Dict] = None
+
+    def _perguntar(self, chave: str, pergunta: str, padrao: str = "") -> str:
+        """Lê a resposta do manifesto quando presente, senão do terminal"""
+        if self.manifesto is not None:
+            valor = self.manifesto.get(chave, padrao)
+            if isinstance(valor, int) and not isinstance(valor, bool):
+                return str(valor)
+            return valor if isinstance(valor, str) else ("s" if valor else "n")
+        return input(pergunta).strip()
         
     def print_header(self):
         print("=" * 60)
@@ -709,6 +2206,9 @@ class VPSInstaller:
         print("7. Sair")
         
     def run(self):
+        if InstallJournal(self.config_manager).pendente():
+            if input("\n[AVISO] Há uma instalação interrompida. Retomar agora? (S/n): ").lower() != 'n':
+                self.retomar_instalacao()
         while True:
             self.print_header()
             self.print_menu()
@@ -819,7 +2319,7 @@ class VPSInstaller:
         else:
             print("Nenhuma stack selecionada!")
             
-    def _executar_instalacao(self, stacks_selecionadas: List[str]):
+    def _executar_instalacao(self, stacks_selecionadas: List[str]) -> bool:
         # Resolver dependências
         stacks_com_deps = []
         for stack in stacks_selecionadas:
@@ -828,22 +2328,34 @@ class VPSInstaller:
                 if dep not in stacks_com_deps:
                     stacks_com_deps.append(dep)
                     
+        # Ordem topológica incluindo dependências opcionais presentes (ex.: minio antes de chatwoot)
+        stacks_com_deps = [s for onda in DependencyManager.deploy_order(stacks_com_deps) for s in onda]
+
+        # O cache de imagens sobe primeiro para que os pulls das demais stacks já passem por ele
+        if "registry" in stacks_com_deps:
+            stacks_com_deps.insert(0, stacks_com_deps.pop(stacks_com_deps.index("registry")))
+
         print(f"\n[INFO] Stacks a serem instaladas (com dependências): {', '.join(stacks_com_deps)}")
         
         # Obter domínio base
-        dominio_base = input("\nDigite o domínio base (ex: exemplo.com.br): ").strip()
+        dominio_base = self._perguntar("dominio_base", "\nDigite o domínio base (ex: exemplo.com.br): ")
         while not dominio_base:
+            if self.manifesto is not None:
+                raise ValueError("manifesto sem 'dominio_base'")
             dominio_base = input("Domínio base não pode ser vazio: ").strip()
             
         # Perguntar sobre prefixos customizados
         prefixos = {}
-        customizar = input("\nDeseja customizar os prefixos de domínio? (s/N): ").lower() == 's'
+        customizar = self.manifesto is None and \
+            input("\nDeseja customizar os prefixos de domínio? (s/N): ").lower() == 's'
         
         if customizar:
             print("\nPrefixos padrão:")
             for stack in stacks_com_deps:
                 info = STACK_CONFIG.get(stack, {})
                 prefixo_padrao = info.get("prefixo", stack)
+                if prefixo_padrao is None:
+                    continue
                 print(f"- {stack}: {prefixo_padrao}.{dominio_base}")
                 
                 novo_prefixo = input(f"Novo prefixo para {stack} (Enter para manter '{prefixo_padrao}'): ").strip()
@@ -862,12 +2374,14 @@ class VPSInstaller:
                     else:
                         prefixos[f"{stack}_console"] = prefixo_console_padrao
         else:
-            # Usar prefixos padrão
+            # Usar prefixos padrão (ou os do manifesto)
             for stack in stacks_com_deps:
                 info = STACK_CONFIG.get(stack, {})
                 prefixos[stack] = info.get("prefixo", stack)
                 if "prefixo_console" in info:
                     prefixos[f"{stack}_console"] = info["prefixo_console"]
+            if self.manifesto is not None:
+                prefixos.update(self.manifesto.get("prefixos", {}))
                     
         # Gerar e mostrar configuração DNS
         dns_config = self.dns_generator.generate_dns_config(dominio_base, stacks_com_deps, prefixos)
@@ -880,38 +2394,110 @@ class VPSInstaller:
             f.write(dns_config)
         print(f"\n[INFO] Configuração DNS salva em: {dns_file}")
         
-        input("\nPressione Enter após configurar o DNS no Cloudflare...")
+        if self.manifesto is None:
+            input("\nPressione Enter após configurar o DNS no Cloudflare...")
         
         # Coletar informações adicionais necessárias
         config = self.config_manager.load_config()
         
         if "traefik" in stacks_com_deps:
-            config["le_email"] = input("\nE-mail para Let's Encrypt: ").strip()
-            config["cf_email"] = input("E-mail do Cloudflare (opcional): ").strip()
-            config["cf_api_key"] = input("API Key do Cloudflare (opcional): ").strip()
+            config["le_email"] = self._perguntar("le_email", "\nE-mail para Let's Encrypt: ")
+            config["cf_email"] = self._perguntar("cf_email", "E-mail do Cloudflare (opcional): ")
+            config["cf_api_key"] = self._perguntar("cf_api_key", "API Key do Cloudflare (opcional): ")
+            config["traefik_performance"] = self._perguntar(
+                "traefik_performance",
+                "Ativar perfil de performance do Traefik (HTTP/3, compressão, métricas)? (s/N): "
+            ).lower() == 's'
+            config["traefik_routing"] = "file" if self._perguntar(
+                "traefik_routing_file",
+                "Usar rotas em arquivo (file provider) em vez de labels Docker? (s/N): "
+            ).lower() == 's' else "docker"
             
+        self._configurar_stacks(config, stacks_com_deps, dominio_base)
+
+        config["dominio_base"] = dominio_base
+        config.setdefault("prefixos", {}).update(prefixos)
+        config["stacks"] = sorted(set(config.get("stacks", [])) | set(stacks_com_deps))
+        self.config_manager.save_config(config)
+
+        journal = InstallJournal(self.config_manager)
+        journal.iniciar(stacks_com_deps, dominio_base, prefixos, dns_file)
+        return self._executar_passos(journal)
+
+    def _configurar_stacks(self, config: Dict, stacks_com_deps: List[str], dominio_base: str):
+        """Senhas e opções das stacks ainda sem configuração salva (as já configuradas são mantidas)"""
         # Gerar senhas para serviços
         if "postgres" in stacks_com_deps and "postgres_password" not in config:
             config["postgres_password"] = self._generate_password()
             print(f"[INFO] Senha PostgreSQL gerada: {config['postgres_password']}")
+
+        if "postgres" in stacks_com_deps and "postgres_replicas_nos" not in config:
+            config["postgres_replicas_nos"] = self._escolher_nos_replicas()
+            if config["postgres_replicas_nos"]:
+                config["postgres_replicacao_password"] = self._generate_password(24)
+                print(f"[INFO] Réplicas de leitura do PostgreSQL em: {', '.join(config['postgres_replicas_nos'])}")
+                if "pgbouncer" in stacks_com_deps:
+                    print("[INFO] Leituras via PgBouncer: banco '<nome>_leitura' em pgbouncer:5432")
             
         if "redis" in stacks_com_deps and "redis_password" not in config:
             config["redis_password"] = self._generate_password()
             print(f"[INFO] Senha Redis gerada: {config['redis_password']}")
             
+        for banco in PostgresProvisioner.bancos(stacks_com_deps):
+            chave = PostgresProvisioner.chave_senha(banco)
+            if chave not in config:
+                config[chave] = self._generate_password(24)
+                print(f"[INFO] Senha do role PostgreSQL '{banco['nome']}' gerada: {config[chave]}")
+
         if "pgvector" in stacks_com_deps and "pgvector_password" not in config:
             config["pgvector_password"] = self._generate_password()
             print(f"[INFO] Senha PGVector gerada: {config['pgvector_password']}")
+            config["pgvector_schema"] = self._perguntar(
+                "pgvector_schema", "Criar schema 'embeddings' com índice vetorial no PGVector? (s/N): "
+            ).lower() == 's'
+            if config["pgvector_schema"]:
+                # Acima de 4000 nem o halfvec aceita índice (HNSW e IVFFlat)
+                while True:
+                    dimensoes = self._perguntar("pgvector_dimensoes", "Dimensões dos embeddings [1536]: ", "1536")
+                    dimensoes = dimensoes or "1536"
+                    if dimensoes.isdigit() and 1 <= int(dimensoes) <= 4000:
+                        break
+                    if self.manifesto is not None:
+                        raise ValueError(f"manifesto com 'pgvector_dimensoes' inválido ({dimensoes}): use 1 a 4000")
+                    print("[ERRO] Informe um número entre 1 e 4000")
+                config["pgvector_dimensoes"] = int(dimensoes)
+                indice = self._perguntar("pgvector_indice", "Tipo de índice (hnsw/ivfflat) [hnsw]: ", "hnsw").lower()
+                config["pgvector_indice"] = indice if indice in ("hnsw", "ivfflat") else "hnsw"
             
         if "rabbitmq" in stacks_com_deps and "rabbitmq_password" not in config:
             config["rabbitmq_user"] = "admin"
             config["rabbitmq_password"] = self._generate_password()
             print(f"[INFO] Credenciais RabbitMQ - Usuário: admin, Senha: {config['rabbitmq_password']}")
-            
+            tipo_fila = self._perguntar(
+                "rabbitmq_tipo_fila", "Tipo de fila padrão do RabbitMQ (quorum/classic) [quorum]: ", "quorum"
+            ).lower()
+            config["rabbitmq_tipo_fila"] = tipo_fila if tipo_fila in ("quorum", "classic") else "quorum"
+
         if "minio" in stacks_com_deps and "minio_root_password" not in config:
             config["minio_root_user"] = "minioadmin"
             config["minio_root_password"] = self._generate_password()
             print(f"[INFO] Credenciais MinIO - Usuário: minioadmin, Senha: {config['minio_root_password']}")
+        # Apps com armazenamento S3 recebem chaves próprias, restritas ao seu bucket no MinIO.
+        # Só na primeira instalação da app: uma já instalada tem os arquivos no volume local
+        ja_instaladas = set(config.get("stacks", [])) | set(StackTeardown.stacks_instaladas()) \
+            if "minio" in stacks_com_deps else set()
+        for app in ("chatwoot", "directus"):
+            if "minio" in stacks_com_deps and app in stacks_com_deps and f"{app}_s3_access_key" not in config:
+                if app in ja_instaladas:
+                    print(f"[AVISO] {app} já instalado com armazenamento local: continua sem o MinIO "
+                          f"(migre os arquivos com 'mc mirror' antes de trocar)")
+                    continue
+                config[f"{app}_s3_access_key"] = f"{app}-{self._generate_password(12).lower()}"
+                config[f"{app}_s3_secret_key"] = self._generate_password(40)
+                print(f"[INFO] {app} usará o MinIO para arquivos (bucket '{app}')")
+
+        if "minio" in stacks_com_deps and "minio_modo" not in config and "minio" in STACK_CLASSES:
+            STACK_CLASSES["minio"](self.config_manager).configurar_layout(config, self.manifesto)
             
         if "grafana" in stacks_com_deps and "grafana_password" not in config:
             config["grafana_password"] = self._generate_password()
@@ -927,7 +2513,24 @@ class VPSInstaller:
             
         if "chatwoot" in stacks_com_deps and "chatwoot_secret_key" not in config:
             config["chatwoot_secret_key"] = self._generate_password(64)
+
+        if "evolution" in stacks_com_deps and "rabbitmq" in stacks_com_deps and "evolution_rabbitmq_password" not in config:
+            config["evolution_rabbitmq_password"] = self._generate_password(24)
+            print("[INFO] Eventos da Evolution API serão publicados no RabbitMQ (vhost 'evolution')")
+
+        if "evolution" in stacks_com_deps and "chatwoot" in stacks_com_deps and "chatwoot_admin_password" not in config:
+            # Política de senha do Chatwoot exige maiúscula, minúscula, número e caractere especial
+            config["chatwoot_admin_email"] = f"admin@{dominio_base}"
+            config["chatwoot_admin_password"] = self._generate_password(20) + "!aA1"
+            print(f"[INFO] Credenciais Chatwoot - Admin: admin@{dominio_base}, Senha: {config['chatwoot_admin_password']}")
             
+        if "registry" in stacks_com_deps and "registry_porta" not in config:
+            config["registry_porta"] = 5000
+            config["dockerhub_usuario"] = self._perguntar(
+                "dockerhub_usuario", "Usuário Docker Hub para o cache (opcional, aumenta o rate limit): ")
+            if config["dockerhub_usuario"]:
+                config["dockerhub_token"] = self._perguntar("dockerhub_token", "Token de acesso Docker Hub: ")
+
         if "directus" in stacks_com_deps:
             if "directus_key" not in config:
                 config["directus_key"] = self._generate_password(32)
@@ -935,33 +2538,102 @@ class VPSInstaller:
                 config["directus_secret"] = self._generate_password(32)
                 print(f"[INFO] Credenciais Directus - Admin: admin@{dominio_base}, Senha: {config['directus_secret'][:16]}")
             
-        self.config_manager.save_config(config)
+        # Segredos declarados nos metadados (ex.: plugins): chave -> tamanho
+        for stack_name in stacks_com_deps:
+            for chave, tamanho in STACK_CONFIG.get(stack_name, {}).get("senhas", {}).items():
+                if chave not in config:
+                    config[chave] = self._generate_password(tamanho)
+
+    def instalar_por_manifesto(self, manifesto: Dict, retomar: bool = False) -> bool:
+        """Instalação não interativa: stacks/perfil e respostas vêm do manifesto"""
+        self.manifesto = manifesto
+        if retomar and InstallJournal(self.config_manager).pendente():
+            return self.retomar_instalacao()
+        stacks = manifesto.get("stacks") or PERFIS_INSTALACAO.get(manifesto.get("perfil", ""), {}).get("stacks")
+        if not stacks:
+            print("[ERRO] Manifesto precisa de 'stacks' ou de um 'perfil' válido")
+            return False
+        return self._executar_instalacao(stacks)
+
+    def retomar_instalacao(self) -> bool:
+        """Continua a instalação registrada no journal a partir do passo que falhou"""
+        journal = InstallJournal(self.config_manager)
+        if not journal.pendente():
+            print("[INFO] Nenhuma instalação interrompida para retomar")
+            return False
+        print(f"\n[INFO] Retomando instalação iniciada em {journal.dados['iniciado']}: "
+              f"{', '.join(journal.dados['stacks'])}")
+        return self._executar_passos(journal)
+
+    def _executar_passos(self, journal: InstallJournal) -> bool:
+        config = self.config_manager.load_config()
+        stacks_com_deps = list(journal.dados["stacks"])
+        dominio_base = journal.dados["dominio_base"]
+        prefixos = journal.dados["prefixos"]
+
+        # No modo file-provider as rotas são geradas antes do deploy do Traefik
+        if config.get("traefik_routing") == "file":
+            self._atualizar_rotas_traefik(stacks_com_deps, dominio_base, prefixos)
         
         # Instalar Portainer primeiro se estiver na lista
         if "portainer" in stacks_com_deps:
-            self._instalar_portainer(dominio_base, prefixos)
+            if journal.feito("portainer", "pos_deploy"):
+                print("[INFO] portainer já instalada (journal)")
+            else:
+                self._instalar_portainer(dominio_base, prefixos)
+                for passo in InstallJournal.PASSOS:
+                    journal.marcar("portainer", passo)
             stacks_com_deps.remove("portainer")
             
         # Instalar as demais stacks
         portainer_config = self.config_manager.load_portainer_config()
         use_portainer = portainer_config is not None
         
+        falhas = set()
         for stack in stacks_com_deps:
+            if journal.feito(stack, "pos_deploy"):
+                print(f"[INFO] {stack} já instalada (journal)")
+                continue
+            # A lista está em ordem de dependência: uma stack pulada também bloqueia as que dependem dela
+            bloqueios = [d for d in DependencyManager.dependencias_efetivas(stack, stacks_com_deps) if d in falhas]
+            if bloqueios:
+                falhas.add(stack)
+                journal.falhou(stack, f"dependência com falha: {', '.join(bloqueios)}")
+                print(f"[AVISO] {stack} não instalada: dependência com falha ({', '.join(bloqueios)})")
+                continue
             print(f"\n[+] Instalando {stack}...")
             try:
-                self._instalar_stack(stack, dominio_base, prefixos, use_portainer)
+                self._instalar_stack(stack, dominio_base, prefixos, use_portainer, journal)
                 print(f"[OK] {stack} instalada com sucesso!")
             except Exception as e:
+                falhas.add(stack)
+                journal.falhou(stack, str(e))
                 print(f"[ERRO] Falha ao instalar {stack}: {e}")
+
+        completo = journal.finalizar()
                 
         # Mostrar resumo final
         print("\n" + "=" * 60)
-        print("INSTALAÇÃO CONCLUÍDA!")
+        print("INSTALAÇÃO CONCLUÍDA!" if completo else "INSTALAÇÃO INCOMPLETA!")
         print("=" * 60)
-        print(f"\nArquivo de configuração DNS: {dns_file}")
+        print(f"\nArquivo de configuração DNS: {journal.dados['dns_file']}")
+        if not completo:
+            print("\nCorrija o problema e execute com --resume para continuar do ponto de falha.")
         print("\nAcesse os serviços pelos URLs listados acima.")
         print("Aguarde alguns minutos para os certificados SSL serem gerados.")
+        return completo
         
+    def _atualizar_rotas_traefik(self, stacks: List[str], dominio_base: str, prefixos: Dict[str, str]):
+        """Gera as rotas das stacks a partir dos YAMLs renderizados e atualiza a config dinâmica"""
+        novas_rotas = {}
+        for stack_name in stacks:
+            stack_class = STACK_CLASSES.get(stack_name)
+            if not stack_class:
+                continue
+            yaml_content = stack_class(self.config_manager).generate_yaml(dominio_base, prefixos)
+            novas_rotas[stack_name] = TraefikRoutes.extrair_rotas(stack_name, yaml_content)
+        TraefikRoutes(self.config_manager).atualizar(novas_rotas)
+
     def _instalar_portainer(self, dominio_base: str, prefixos: Dict[str, str]):
         print("\n[+] Instalando Portainer...")
         
@@ -969,7 +2641,7 @@ class VPSInstaller:
         portainer_config = self.config_manager.load_portainer_config()
         
         if not portainer_config:
-            username = input("Usuário admin do Portainer: ").strip()
+            username = self._perguntar("portainer_usuario", "Usuário admin do Portainer: ", "admin")
             while not username:
                 username = input("Usuário não pode ser vazio: ").strip()
                 
@@ -987,7 +2659,7 @@ class VPSInstaller:
         # Instalar stack
         stack_class = PortainerStack(self.config_manager)
         stack_class.create_resources()
-        yaml_content = stack_class.generate_yaml(dominio_base, prefixos)
+        yaml_content = stack_class.render(dominio_base, prefixos, resolver_imagens=True)
         stack_class.deploy_via_cli(yaml_content)
         
         # Aguardar Portainer iniciar
@@ -1023,23 +2695,50 @@ class VPSInstaller:
         except Exception as e:
             print(f"[AVISO] Não foi possível configurar admin automaticamente: {e}")
             
-    def _instalar_stack(self, stack_name: str, dominio_base: str, prefixos: Dict[str, str], use_portainer: bool):
+    def _instalar_stack(self, stack_name: str, dominio_base: str, prefixos: Dict[str, str], use_portainer: bool,
+                        journal: InstallJournal):
         # Obter classe da stack
         stack_class = STACK_CLASSES.get(stack_name)
         
         if not stack_class:
             print(f"[AVISO] Stack {stack_name} ainda não implementada")
+            for passo in InstallJournal.PASSOS:
+                journal.marcar(stack_name, passo)
             return
             
         # Criar instância e recursos
         stack = stack_class(self.config_manager)
-        stack.create_resources()
+        if not journal.feito(stack_name, "recursos"):
+            stack.create_resources()
+            journal.marcar(stack_name, "recursos")
         
-        # Gerar YAML
-        yaml_content = stack.generate_yaml(dominio_base, prefixos)
-        
-        # Deploy
-        if use_portainer:
+        # Gerar YAML; se mudou desde a última tentativa, o deploy é refeito
+        yaml_content = stack.render(dominio_base, prefixos, resolver_imagens=True)
+        digest = hashlib.sha256(yaml_content.encode()).hexdigest()
+        if journal.valor(stack_name, "renderizado") != digest:
+            journal.invalidar(stack_name, "renderizado")
+            journal.marcar(stack_name, "renderizado", digest)
+
+        if not journal.feito(stack_name, "deploy"):
+            self._deploy_stack(stack, yaml_content, use_portainer)
+            journal.marcar(stack_name, "deploy")
+
+        if not journal.feito(stack_name, "verificado"):
+            # Verificar status após deploy
+            print(f"[INFO] Verificando status de {stack_name}...")
+            if self._verificar_status_stack(stack_name, timeout=self._timeout_verificacao(yaml_content)):
+                print(f"[OK] {stack_name} está funcionando corretamente")
+                journal.marcar(stack_name, "verificado")
+            else:
+                raise RuntimeError(f"{stack_name} não ficou saudável a tempo. Verifique os logs.")
+
+        if not journal.feito(stack_name, "pos_deploy"):
+            stack.post_deploy()
+            journal.marcar(stack_name, "pos_deploy")
+
+    def _deploy_stack(self, stack: StackCommand, yaml_content: str, use_portainer: bool):
+        # No modo offline o deploy é sempre via CLI, que não tenta resolver as imagens no registry
+        if use_portainer and not self.config_manager.load_config().get("offline"):
             portainer_config = self.config_manager.load_portainer_config()
             stack.deploy_via_portainer(
                 yaml_content,
@@ -1050,13 +2749,6 @@ class VPSInstaller:
         else:
             stack.deploy_via_cli(yaml_content)
             
-        # Verificar status após deploy
-        print(f"[INFO] Verificando status de {stack_name}...")
-        if self._verificar_status_stack(stack_name):
-            print(f"[OK] {stack_name} está funcionando corretamente")
-        else:
-            print(f"[AVISO] {stack_name} pode estar com problemas. Verifique os logs.")
-            
     def gerenciar_stacks(self):
         print("\n=== GERENCIAR STACKS ===")
         
@@ -1072,22 +2764,378 @@ class VPSInstaller:
         
         print("\n1. Remover stack")
         print("2. Ver logs de uma stack")
-        print("3. Voltar")
+        print("3. Redeploy (rolling update)")
+        print("4. Backup das stacks")
+        print("5. Restaurar backup")
+        print("6. Painel de status ao vivo")
+        print("7. Atualizar imagens (lock de digests)")
+        print("8. Voltar")
         
         choice = input("\nEscolha uma opção: ")
         
         if choice == '1':
-            stack_name = input("Nome da stack para remover: ").strip()
-            if stack_name:
-                subprocess.run(["docker", "stack", "rm", stack_name])
-                print(f"[OK] Stack {stack_name} removida")
+            stacks = input("Stacks para remover (separadas por vírgula): ").strip()
+            if stacks:
+                self.remover_stacks([s.strip() for s in stacks.split(',') if s.strip()])
         elif choice == '2':
-            stack_name = input("Nome da stack para ver logs: ").strip()
+            alvos = input("Stacks, serviços ou categoria (ex.: chatwoot,postgres ou aplicacao): ").strip()
+            if alvos:
+                filtro = input("Filtro regex (opcional): ").strip() or None
+                LogAggregator().executar([a.strip() for a in alvos.split(',') if a.strip()],
+                                         tail=100, seguir=True, filtro=filtro, ignorar_maiusculas=True)
+        elif choice == '3':
+            stack_name = input("Nome da stack para redeploy: ").strip()
             if stack_name:
-                subprocess.run(["docker", "stack", "services", stack_name])
-                service = input("Nome do serviço: ").strip()
-                if service:
-                    subprocess.run(["docker", "service", "logs", f"{stack_name}_{service}", "-f"])
+                self.redeploy([stack_name])
+        elif choice == '4':
+            from backup_manager import DESTINO_PADRAO
+            destino = input(f"Destino (diretório ou minio:bucket) [{DESTINO_PADRAO}]: ").strip()
+            self.backup(destino or DESTINO_PADRAO)
+        elif choice == '5':
+            origem = input("Origem (diretório do backup ou minio:bucket/ID): ").strip()
+            if origem and input("A restauração sobrescreve os dados atuais. Continuar? (s/N): ").lower() == 's':
+                self.restaurar(origem)
+        elif choice == '6':
+            StackDashboard().executar()
+        elif choice == '7':
+            alteradas = self.atualizar_imagens(aplicar=False)
+            if alteradas and input("\nAtualizar o lock e redeployar as stacks afetadas? (s/N): ").lower() == 's':
+                self.atualizar_imagens(alteradas, redeploy=True)
+                    
+    def atualizar_imagens(self, imagens: Optional[List[str]] = None, aplicar: bool = True,
+                          redeploy: bool = False) -> List[str]:
+        """Atualiza o lock de digests e, opcionalmente, redeploya as stacks que usam as imagens alteradas"""
+        lock = ImageLock(self.config_manager)
+        if not imagens and not self.config_manager.load_image_lock()["imagens"]:
+            print("[INFO] Lock vazio: as imagens são registradas no primeiro deploy de cada stack")
+            return []
+        alteradas = lock.atualizar(imagens, aplicar=aplicar)
+        if redeploy and aplicar and alteradas:
+            config = self.config_manager.load_config()
+            afetadas = []
+            for stack_name in StackTeardown.stacks_instaladas():
+                stack_class = STACK_CLASSES.get(stack_name)
+                if not stack_class:
+                    continue
+                # Mesmo YAML do deploy: imagens que dependem da configuração (versões, modos) entram na conta
+                yaml_content = stack_class(self.config_manager).render(
+                    config.get("dominio_base", ""), config.get("prefixos", {}))
+                if any(re.search(rf"^\s+image:\s*{re.escape(i)}(@\S+)?\s*$", yaml_content, re.MULTILINE)
+                       for i in alteradas):
+                    afetadas.append(stack_name)
+            if afetadas:
+                print(f"\n[+] Redeploy: {', '.join(afetadas)}")
+                self.redeploy(afetadas)
+        return alteradas
+
+    def redeploy(self, stacks: List[str], timeout: int = 600) -> bool:
+        """Redeploya as stacks e acompanha o rolling update até o fim"""
+        config = self.config_manager.load_config()
+        dominio_base = config.get("dominio_base")
+        if not dominio_base:
+            print("[ERRO] Domínio base não encontrado na configuração. Execute uma instalação primeiro.")
+            return False
+        prefixos = config.get("prefixos", {})
+        if config.get("traefik_routing") == "file":
+            self._atualizar_rotas_traefik(stacks, dominio_base, prefixos)
+
+        sucesso = True
+        for stack_name in stacks:
+            stack_class = STACK_CLASSES.get(stack_name)
+            if not stack_class:
+                print(f"[AVISO] Stack {stack_name} não implementada")
+                sucesso = False
+                continue
+            stack = stack_class(self.config_manager)
+            stack.create_resources()
+            inicio = time.time()
+            stack.deploy_via_cli(stack.render(dominio_base, prefixos, resolver_imagens=True))
+            sucesso = self._acompanhar_rollout(stack_name, inicio, timeout) and sucesso
+        return sucesso
+
+    # Spec alterada sem UpdateStatus novo após este tempo: atualização sem troca de tarefas
+    CARENCIA_ROLLOUT = 15
+
+    def _acompanhar_rollout(self, stack_name: str, inicio: float, timeout: int) -> bool:
+        """Consulta o UpdateStatus de todos os serviços da stack numa única chamada"""
+        estados_finais = {"completed", "rollback_completed", "rollback_paused", "paused"}
+        # Timestamps do Docker vêm em segundos inteiros
+        desde = int(inicio)
+        estados = {}
+        while time.time() - inicio < timeout:
+            ids = subprocess.run(["docker", "stack", "services", "-q", stack_name],
+                               capture_output=True, text=True).stdout.split()
+            if not ids:
+                time.sleep(1)
+                continue
+            result = subprocess.run(
+                ["docker", "service", "inspect", "--format",
+                 "{{.Spec.Name}} {{.UpdatedAt.Unix}} "
+                 "{{if .UpdateStatus}}{{if .UpdateStatus.StartedAt}}{{.UpdateStatus.StartedAt.Unix}}{{else}}0{{end}} "
+                 "{{.UpdateStatus.State}}{{else}}0 {{end}}"] + ids,
+                capture_output=True, text=True
+            )
+            estados = {}
+            concluido = True
+            for linha in result.stdout.strip().splitlines():
+                nome, atualizado, iniciado, estado = (linha.split(" ", 3) + [""] * 3)[:4]
+                estado = estado.strip()
+                if int(atualizado or 0) < desde:
+                    # Spec não mudou neste deploy: um UpdateStatus antigo não conta
+                    estados[nome] = ""
+                elif int(iniciado or 0) >= desde:
+                    estados[nome] = estado
+                    concluido = concluido and estado in estados_finais
+                elif time.time() - inicio >= self.CARENCIA_ROLLOUT:
+                    estados[nome] = ""
+                else:
+                    # Atualização ainda não iniciada pelo orquestrador
+                    estados[nome] = "pendente"
+                    concluido = False
+            if estados and concluido:
+                break
+            time.sleep(2)
+        else:
+            print(f"[AVISO] Rollout de {stack_name} não terminou em {timeout}s")
+            return False
+
+        duracao = time.time() - inicio
+        falhas = {nome: estado for nome, estado in estados.items() if estado not in ("", "completed")}
+        for nome, estado in sorted(estados.items()):
+            print(f"  {nome}: {estado or 'sem alterações'}")
+        if falhas:
+            print(f"[AVISO] Rollout de {stack_name} revertido/pausado após {duracao:.1f}s")
+            return False
+        print(f"[OK] Rollout de {stack_name} concluído em {duracao:.1f}s")
+        return True
+
+    def backup(self, destino: str, stacks: Optional[List[str]] = None, jobs: int = 4) -> bool:
+        from backup_manager import BackupManager
+        return BackupManager(self.config_manager, STACK_CONFIG, jobs=jobs).backup(destino, stacks) is not None
+
+    def restaurar(self, origem: str, stacks: Optional[List[str]] = None, jobs: int = 4) -> bool:
+        from backup_manager import BackupManager
+        return BackupManager(self.config_manager, STACK_CONFIG, jobs=jobs).restaurar(origem, stacks)
+
+    def _renderizar_instaladas(self) -> Dict[str, str]:
+        config = self.config_manager.load_config()
+        instaladas = StackTeardown.stacks_instaladas()
+        yamls = {}
+        for stack_name in instaladas:
+            stack_class = STACK_CLASSES.get(stack_name)
+            if stack_class:
+                yamls[stack_name] = stack_class(self.config_manager).render(
+                    config.get("dominio_base", ""), config.get("prefixos", {}))
+        return yamls
+
+    def migrar_exportar(self, saida: str, jobs: int = 4) -> bool:
+        from backup_manager import BackupManager, MigrationBundle
+        backup_manager = BackupManager(self.config_manager, STACK_CONFIG, jobs=jobs)
+        return MigrationBundle(self.config_manager, backup_manager).exportar(saida, self._renderizar_instaladas())
+
+    def _deploy_e_verificar(self, stack_name: str, yaml_content: str) -> bool:
+        stack = STACK_CLASSES[stack_name](self.config_manager)
+        stack.deploy_via_cli(yaml_content)
+        if not self._verificar_status_stack(stack_name, timeout=self._timeout_verificacao(yaml_content)):
+            return False
+        stack.post_deploy()
+        return True
+
+    def migrar_importar(self, entrada: str, ip: Optional[str] = None, atualizar_dns: bool = True,
+                        jobs: int = 4) -> bool:
+        """Restaura um pacote de migração e redeploya as stacks em ondas paralelas"""
+        import tempfile
+        from backup_manager import BackupManager, MigrationBundle
+
+        inicio = time.time()
+        estado = subprocess.run(["docker", "info", "--format", "{{.Swarm.LocalNodeState}}"],
+                                capture_output=True, text=True).stdout.strip()
+        if estado != "active":
+            self.inicializar_swarm()
+
+        backup_manager = BackupManager(self.config_manager, STACK_CONFIG, jobs=jobs)
+        with tempfile.TemporaryDirectory(prefix="vps-migracao-") as tmp:
+            pacote = MigrationBundle(self.config_manager, backup_manager).extrair(entrada, tmp)
+            # Os YAMLs do pacote são só referência (quais stacks estavam no ar): as configs com hash
+            # de conteúdo e o dimensionamento dependem deste host, então tudo é renderizado de novo aqui
+            stacks = [s for s in pacote["yamls"] if s in STACK_CLASSES]
+            with open(os.path.join(pacote["backup"], "manifest.json")) as f:
+                artefatos = [a for a in json.load(f)["artefatos"] if a.get("ok")]
+
+            # Recursos primeiro (em série, são compartilhados), depois os volumes com as stacks paradas
+            config = self.config_manager.load_config()
+            dominio_base, prefixos = config.get("dominio_base", ""), config.get("prefixos", {})
+            yamls = {}
+            for stack_name in stacks:
+                stack = STACK_CLASSES[stack_name](self.config_manager)
+                stack.create_resources()
+                yamls[stack_name] = stack.render(dominio_base, prefixos, resolver_imagens=True)
+            ok = backup_manager.restaurar_volumes(
+                pacote["backup"], [a for a in artefatos if a["tipo"] in ("volume", "redis")])
+
+            if config.get("traefik_routing") == "file":
+                self._atualizar_rotas_traefik(stacks, dominio_base, prefixos)
+
+            for onda in DependencyManager.deploy_order(list(yamls)):
+                print(f"\n[+] Deploy: {', '.join(onda)}")
+                with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(onda)))) as executor:
+                    ok = all(executor.map(lambda s: self._deploy_e_verificar(s, yamls[s]), onda)) and ok
+                # Bancos são restaurados antes das stacks que dependem deles subirem
+                bancos = [a for a in artefatos if a["tipo"].startswith("postgres") and a["stack"] in onda]
+                if bancos:
+                    ok = backup_manager.restaurar_bancos(pacote["backup"], bancos) and ok
+
+        config = self.config_manager.load_config()
+        if atualizar_dns:
+            ip = ip or subprocess.run(["hostname", "-I"], capture_output=True, text=True).stdout.split()[0]
+            if config.get("cf_email") and config.get("cf_api_key") and config.get("dominio_base"):
+                try:
+                    CloudflareDNS(config["cf_email"], config["cf_api_key"]).apontar_registro_a(
+                        config["dominio_base"], ip)
+                except Exception as e:
+                    print(f"[ERRO] Falha ao atualizar DNS: {e}")
+                    ok = False
+            else:
+                print(f"[AVISO] Cloudflare não configurado: aponte {config.get('dominio_base')} para {ip} manualmente")
+
+        print(f"\n[{'OK' if ok else 'AVISO'}] Migração concluída em {time.time() - inicio:.1f}s")
+        return ok
+
+    def _com_dependencias(self, stacks: List[str]) -> List[List[str]]:
+        """Stacks pedidas e suas dependências, em ondas de deploy"""
+        todas = []
+        for stack_name in stacks:
+            todas.extend(s for s in self.dependency_manager.get_all_dependencies(stack_name) if s not in todas)
+        return DependencyManager.deploy_order(todas)
+
+    def plano(self, stacks: List[str], como_json: bool = False) -> bool:
+        """Ondas de deploy e recursos a criar, com uma consulta ao Docker por tipo de recurso"""
+        desconhecidas = [s for s in stacks if s not in STACK_CONFIG]
+        if desconhecidas:
+            print(f"[ERRO] Stacks desconhecidas: {', '.join(desconhecidas)}")
+            return False
+        instaladas = set(StackTeardown.stacks_instaladas())
+        ondas = []
+        for onda in self._com_dependencias(stacks):
+            itens = []
+            for stack_name in onda:
+                recursos = STACK_CLASSES[stack_name](self.config_manager).get_required_resources() \
+                    if stack_name in STACK_CLASSES else {}
+                faltando = {tipo: [n for n in nomes if not StackCommand.recurso_existe(tipo[:-1], n)]
+                            for tipo, nomes in recursos.items()}
+                itens.append({"stack": stack_name, "instalada": stack_name in instaladas,
+                              "implementada": stack_name in STACK_CLASSES,
+                              "criar": {tipo: nomes for tipo, nomes in faltando.items() if nomes}})
+            ondas.append(itens)
+
+        if como_json:
+            print(json.dumps({"ondas": ondas}, indent=2))
+            return True
+        for i, onda in enumerate(ondas, 1):
+            print(f"Onda {i}:")
+            for item in onda:
+                estado = "instalada" if item["instalada"] else "nova"
+                if not item["implementada"]:
+                    estado = "não implementada"
+                criar = "; ".join(f"{tipo}: {', '.join(nomes)}" for tipo, nomes in item["criar"].items())
+                print(f"  - {item['stack']:<12} {estado:<16} {('criar ' + criar) if criar else ''}".rstrip())
+        return True
+
+    def render_stacks(self, stacks: List[str], saida: Optional[str] = None) -> bool:
+        """YAML final (o do deploy, com os digests já no lock) para stdout ou um arquivo por stack em `saida`"""
+        config = self.config_manager.load_config()
+        dominio_base = config.get("dominio_base")
+        if not dominio_base:
+            print("[ERRO] Domínio base não encontrado na configuração. Execute uma instalação primeiro.")
+            return False
+        for stack_name in stacks:
+            if stack_name not in STACK_CLASSES:
+                print(f"[ERRO] Stack {stack_name} não implementada")
+                return False
+            # Sem --saida o YAML vai para stdout: avisos do render seguem para stderr
+            with redirect_stdout(sys.stdout if saida else sys.stderr):
+                yaml_content = STACK_CLASSES[stack_name](self.config_manager).render(
+                    dominio_base, config.get("prefixos", {}))
+            if saida:
+                os.makedirs(saida, exist_ok=True)
+                with open(os.path.join(saida, f"{stack_name}.yaml"), "w") as f:
+                    f.write(yaml_content)
+                print(f"[OK] {os.path.join(saida, stack_name + '.yaml')}")
+            else:
+                print(f"# --- {stack_name}\n{yaml_content}")
+        return True
+
+    def deploy_stacks(self, stacks: List[str], jobs: int = 4) -> bool:
+        """Deploy não interativo com a configuração salva: recursos em lote, ondas em paralelo"""
+        config = self.config_manager.load_config()
+        dominio_base = config.get("dominio_base")
+        if not dominio_base:
+            print("[ERRO] Domínio base não encontrado. Use 'instalar --manifesto' para a primeira instalação.")
+            return False
+        ondas = [[s for s in onda if s in STACK_CLASSES] for onda in self._com_dependencias(stacks)]
+        ondas = [onda for onda in ondas if onda]
+        todas = [s for onda in ondas for s in onda]
+
+        # Stacks novas recebem senhas e opções padrão (sem perguntas) gravadas antes do render; a lista
+        # de stacks também é gravada antes, pois post_deploy (bancos, buckets) se baseia nela
+        manifesto, self.manifesto = self.manifesto, ({} if self.manifesto is None else self.manifesto)
+        try:
+            self._configurar_stacks(config, todas, dominio_base)
+        finally:
+            self.manifesto = manifesto
+        for stack_name in todas:
+            info = STACK_CONFIG.get(stack_name, {})
+            if info.get("prefixo"):
+                config.setdefault("prefixos", {}).setdefault(stack_name, info["prefixo"])
+            if info.get("prefixo_console"):
+                config.setdefault("prefixos", {}).setdefault(f"{stack_name}_console", info["prefixo_console"])
+        config["stacks"] = sorted(set(config.get("stacks", [])) | set(todas))
+        self.config_manager.save_config(config)
+        prefixos = config.get("prefixos", {})
+        # No modo file-provider as rotas são geradas antes do deploy do Traefik
+        if config.get("traefik_routing") == "file":
+            self._atualizar_rotas_traefik(todas, dominio_base, prefixos)
+
+        inicio = time.time()
+        ok = True
+        for onda in ondas:
+            print(f"\n[+] Deploy: {', '.join(onda)}")
+            yamls = {}
+            for stack_name in onda:
+                # Recursos são compartilhados entre stacks: criados em série, sobre o inventário em cache
+                stack = STACK_CLASSES[stack_name](self.config_manager)
+                stack.create_resources()
+                yamls[stack_name] = stack.render(dominio_base, prefixos, resolver_imagens=True)
+            with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(onda)))) as executor:
+                ok = all(executor.map(lambda s: self._deploy_e_verificar(s, yamls[s]), onda)) and ok
+
+        print(f"\n[{'OK' if ok else 'AVISO'}] Deploy concluído em {time.time() - inicio:.1f}s")
+        return ok
+
+    def remover_stacks(self, stacks: List[str], gc: Optional[bool] = None, paralelo: int = 4,
+                       confirmar: bool = True):
+        instaladas = StackTeardown.stacks_instaladas()
+        alvo = [s for s in stacks if s in instaladas]
+        for stack in [s for s in stacks if s not in instaladas]:
+            print(f"[AVISO] Stack {stack} não está instalada")
+        if not alvo:
+            return
+
+        dependentes = []
+        for stack in alvo:
+            for dep in DependencyManager.get_all_dependents(stack, instaladas):
+                if dep not in alvo and dep not in dependentes:
+                    dependentes.append(dep)
+        if dependentes:
+            print(f"[INFO] Stacks dependentes que também serão removidas: {', '.join(dependentes)}")
+            alvo.extend(dependentes)
+
+        if confirmar and input(f"Remover {', '.join(alvo)}? (s/N): ").lower() != 's':
+            return
+        if gc is None:
+            gc = input("Remover também volumes, configs e redes órfãos (APAGA DADOS)? (s/N): ").lower() == 's'
+
+        StackTeardown(self.config_manager, max_paralelo=paralelo).remover(alvo, gc=gc)
                     
     def configuracoes(self):
         print("\n=== CONFIGURAÇÕES ===")
@@ -1098,7 +3146,9 @@ class VPSInstaller:
         print("2. Alterar senhas dos serviços")
         print("3. Exportar configuração")
         print("4. Importar configuração")
-        print("5. Voltar")
+        print("5. Exportar migração completa (config + stacks + dados)")
+        print("6. Importar migração completa")
+        print("7. Voltar")
         
         choice = input("\nEscolha uma opção: ")
         
@@ -1141,7 +3191,25 @@ class VPSInstaller:
                 print("[OK] Configuração importada com sucesso")
             except Exception as e:
                 print(f"[ERRO] Falha ao importar: {e}")
+
+        elif choice == '5':
+            saida = f"vps_migracao_{datetime.now().strftime('%Y%m%d_%H%M%S')}.tar"
+            self.migrar_exportar(input(f"Arquivo de saída [{saida}]: ").strip() or saida)
+
+        elif choice == '6':
+            entrada = input("Caminho do pacote de migração: ").strip()
+            if entrada:
+                atualizar_dns = input("Atualizar o registro A no Cloudflare ao final? (S/n): ").lower() != 'n'
+                self.migrar_importar(entrada, atualizar_dns=atualizar_dns)
                 
+    # Tempo para baixar as imagens numa instalação nova, somado ao start_period dos healthchecks
+    MARGEM_PULL = 180
+
+    def _timeout_verificacao(self, yaml_content: str) -> int:
+        """Maior start_period dos healthchecks da stack renderizada mais a margem de pull"""
+        periodos = [int(p) for p in re.findall(r"start_period: (\d+)s", yaml_content)]
+        return max(periodos, default=0) + self.MARGEM_PULL
+
     def _verificar_status_stack(self, stack_name: str, timeout: int = 30) -> bool:
         """Verifica se todos os serviços de uma stack estão rodando"""
         import time
@@ -1178,17 +3246,207 @@ class VPSInstaller:
             
         return False
         
+    def _escolher_nos_replicas(self) -> List[str]:
+        """Nós do Swarm (exceto este manager) que recebem uma réplica de streaming cada"""
+        if self.manifesto is not None:
+            return list(self.manifesto.get("postgres_replicas_nos", []))
+        result = subprocess.run(["docker", "node", "ls", "--format", "{{.Hostname}}"],
+                              capture_output=True, text=True)
+        candidatos = [n for n in result.stdout.split() if n != socket.gethostname()]
+        if not candidatos:
+            return []
+        print(f"\nNós disponíveis para réplicas de leitura do PostgreSQL: {', '.join(candidatos)}")
+        lista = input("Nós para réplicas (separados por vírgula, Enter para nenhuma): ").strip()
+        return [n.strip() for n in lista.split(",") if n.strip() in candidatos]
+
     def _generate_password(self, length: int = 16) -> str:
         return ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(length))
 
+def verificar_orcamento_inicio(orcamento_ms: float) -> bool:
+    """Tempo de import e parsing até o despacho do comando, e módulos pesados já carregados"""
+    decorrido = (time.perf_counter() - _INICIO) * 1000
+    pesados = [m for m in ("requests", "stack_implementations", "backup_manager") if m in sys.modules]
+    print(f"[INFO] Inicialização: {decorrido:.1f} ms (orçamento: {orcamento_ms:.0f} ms)", file=sys.stderr)
+    if pesados:
+        print(f"[AVISO] Carregados antes do primeiro uso: {', '.join(pesados)}", file=sys.stderr)
+    return decorrido <= orcamento_ms and not pesados
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Instalador VPS")
+    parser.add_argument("--resume", action="store_true",
+                        help="Retoma a última instalação a partir do passo que falhou")
+    parser.add_argument("--offline", metavar="PACOTE",
+                        help="Carrega as imagens do pacote offline antes de continuar")
+    parser.add_argument("--medir-inicio", action="store_true",
+                        help=f"Mede a inicialização e sai com código 3 acima de {ORCAMENTO_INICIO_MS} ms")
+    subparsers = parser.add_subparsers(dest="comando")
+
+    parser_remover = subparsers.add_parser("remover", help="Remove stacks em ordem reversa de dependências")
+    parser_remover.add_argument("stacks", nargs="+")
+    parser_remover.add_argument("--gc", action="store_true",
+                                help="Remove volumes, configs e redes órfãos (apaga dados)")
+    parser_remover.add_argument("--paralelo", type=int, default=4,
+                                help="Stacks independentes removidas ao mesmo tempo")
+    parser_remover.add_argument("-y", "--sim", action="store_true", help="Não pedir confirmação")
+
+    parser_redeploy = subparsers.add_parser("redeploy", help="Redeploy com rolling update acompanhado")
+    parser_redeploy.add_argument("stacks", nargs="+")
+    parser_redeploy.add_argument("--timeout", type=int, default=600, help="Tempo máximo do rollout (s)")
+
+    parser_backup = subparsers.add_parser("backup", help="Backup em streaming dos dados das stacks")
+    parser_backup.add_argument("--destino", default="/var/backups/vps-installer",
+                               help="Diretório local ou minio:bucket[/prefixo]")
+    parser_backup.add_argument("--stacks", nargs="*", help="Limitar a estas stacks")
+    parser_backup.add_argument("--jobs", type=int, default=4, help="Artefatos processados em paralelo")
+
+    parser_restaurar = subparsers.add_parser("restaurar", help="Restaura um backup em paralelo")
+    parser_restaurar.add_argument("origem", help="Diretório do backup ou minio:bucket/[prefixo/]ID")
+    parser_restaurar.add_argument("--stacks", nargs="*", help="Limitar a estas stacks")
+    parser_restaurar.add_argument("--jobs", type=int, default=4, help="Artefatos processados em paralelo")
+
+    parser_logs = subparsers.add_parser("logs", help="Logs mesclados de várias stacks/serviços")
+    parser_logs.add_argument("alvos", nargs="+", help="Stacks, serviços ou categorias (ex.: aplicacao)")
+    parser_logs.add_argument("--since", help="Ex.: 10m, 2h ou timestamp (filtrado no servidor)")
+    parser_logs.add_argument("--tail", type=int, help="Linhas finais por serviço (filtrado no servidor)")
+    parser_logs.add_argument("-f", "--follow", action="store_true", help="Acompanhar novas linhas")
+    parser_logs.add_argument("--grep", help="Regex aplicada às linhas durante o streaming")
+    parser_logs.add_argument("-i", "--ignore-case", action="store_true")
+
+    parser_instalar = subparsers.add_parser("instalar", help="Instalação não interativa a partir de um manifesto")
+    parser_instalar.add_argument("--manifesto", required=True, help="Arquivo JSON do manifesto ('-' para stdin)")
+
+    parser_frota = subparsers.add_parser("frota", help="Instala em vários hosts via SSH a partir de um inventário")
+    parser_frota.add_argument("inventario", help="Arquivo JSON com hosts e manifestos")
+    parser_frota.add_argument("--paralelo", type=int, default=8, help="Hosts processados ao mesmo tempo")
+    parser_frota.add_argument("--hosts", nargs="*", help="Limitar a estes hosts (nome)")
+    parser_frota.add_argument("--logs", default="frota_logs", help="Diretório dos logs por host")
+
+    parser_offline = subparsers.add_parser("pacote-offline", help="Pacote com imagens e instalador para uso offline")
+    offline_sub = parser_offline.add_subparsers(dest="acao", required=True)
+    parser_criar = offline_sub.add_parser("criar", help="Gera o pacote a partir das stacks selecionadas")
+    parser_criar.add_argument("arquivo")
+    grupo_stacks = parser_criar.add_mutually_exclusive_group()
+    grupo_stacks.add_argument("--stacks", nargs="+")
+    grupo_stacks.add_argument("--perfil", choices=list(PERFIS_INSTALACAO), default="completo")
+    parser_criar.add_argument("--jobs", type=int, default=4, help="Pulls em paralelo")
+    parser_carregar = offline_sub.add_parser("carregar", help="Carrega as imagens do pacote")
+    parser_carregar.add_argument("arquivo")
+
+    parser_imagens = subparsers.add_parser("atualizar-imagens",
+                                           help="Re-resolve o lock de digests e mostra o volume a baixar")
+    parser_imagens.add_argument("imagens", nargs="*", help="Limitar a estas imagens (padrão: todas do lock)")
+    parser_imagens.add_argument("--simular", action="store_true", help="Apenas mostra, sem gravar o lock")
+    parser_imagens.add_argument("--redeploy", action="store_true", help="Redeploya as stacks afetadas")
+
+    parser_catalogo = subparsers.add_parser("catalogo", help="Stacks e perfis disponíveis (uma por linha)")
+    parser_catalogo.add_argument("--perfis", action="store_true", help="Lista os perfis em vez das stacks")
+
+    parser_plano = subparsers.add_parser("plano", help="Ondas de deploy e recursos a criar, sem alterar nada")
+    parser_plano.add_argument("stacks", nargs="+")
+    parser_plano.add_argument("--json", action="store_true")
+
+    parser_render = subparsers.add_parser("render", help="Gera o YAML final das stacks com a configuração salva")
+    parser_render.add_argument("stacks", nargs="+")
+    parser_render.add_argument("--saida", help="Diretório para gravar <stack>.yaml (padrão: stdout)")
+
+    parser_deploy = subparsers.add_parser("deploy", help="Deploy não interativo com a configuração salva")
+    parser_deploy.add_argument("stacks", nargs="+")
+    parser_deploy.add_argument("--jobs", type=int, default=4, help="Stacks da mesma onda em paralelo")
+
+    parser_status = subparsers.add_parser("status", help="Painel de status ao vivo das stacks")
+    parser_status.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre atualizações")
+    parser_status.add_argument("--uma-vez", action="store_true", help="Imprime uma única vez e sai")
+
+    parser_migrar = subparsers.add_parser("migrar", help="Migra a instalação completa para outro host")
+    migrar_sub = parser_migrar.add_subparsers(dest="acao", required=True)
+    parser_exportar = migrar_sub.add_parser("exportar", help="Gera o pacote de migração")
+    parser_exportar.add_argument("saida", help="Arquivo de saída ('-' para stdout)")
+    parser_exportar.add_argument("--jobs", type=int, default=4)
+    parser_importar = migrar_sub.add_parser("importar", help="Restaura o pacote e redeploya as stacks")
+    parser_importar.add_argument("entrada", help="Pacote de migração ('-' para stdin)")
+    parser_importar.add_argument("--ip", help="IP do novo host (padrão: primeiro IP local)")
+    parser_importar.add_argument("--sem-dns", action="store_true", help="Não atualizar o DNS no Cloudflare")
+    parser_importar.add_argument("--jobs", type=int, default=4)
+
+    args = parser.parse_args()
+
+    if args.medir_inicio and not verificar_orcamento_inicio(ORCAMENTO_INICIO_MS):
+        sys.exit(3)
+
+    # Consultas de catálogo não tocam no Docker
+    if args.comando == "catalogo":
+        if args.perfis:
+            for nome, perfil in PERFIS_INSTALACAO.items():
+                print(f"{nome}|{perfil['descricao']}|{' '.join(perfil['stacks'])}")
+        else:
+            for nome, info in STACK_CONFIG.items():
+                print(f"{nome}|{info['descricao']}|{info['categoria']}|{info.get('prefixo') or ''}")
+        sys.exit(0)
+
+    # O controlador da frota não precisa de root: apenas abre sessões SSH
+    if args.comando == "frota":
+        from fleet_manager import FleetManager
+        frota = FleetManager(args.inventario, paralelo=args.paralelo, dir_logs=args.logs)
+        sys.exit(0 if frota.executar(args.hosts, retomar=args.resume) else 1)
+
     # Verificar se está rodando como root
     if os.geteuid() != 0:
         print("Este script precisa ser executado como root!")
         sys.exit(1)
         
     installer = VPSInstaller()
-    installer.run()
+    if args.offline or args.comando == "pacote-offline":
+        from offline_bundle import OfflineBundle
+        bundle = OfflineBundle(installer.config_manager, STACK_CLASSES)
+        if args.comando == "pacote-offline" and args.acao == "criar":
+            stacks = args.stacks or PERFIS_INSTALACAO[args.perfil]["stacks"]
+            todas = []
+            for stack_name in stacks:
+                todas.extend(s for s in installer.dependency_manager.get_all_dependencies(stack_name)
+                             if s not in todas)
+            sys.exit(0 if bundle.criar(args.arquivo, todas, jobs=args.jobs) else 1)
+        carregado = bundle.carregar(args.arquivo if args.comando == "pacote-offline" else args.offline)
+        if args.comando == "pacote-offline" or not carregado:
+            sys.exit(0 if carregado else 1)
+
+    if args.comando == "instalar":
+        if args.manifesto == "-":
+            manifesto = json.load(sys.stdin)
+        else:
+            with open(args.manifesto) as f:
+                manifesto = json.load(f)
+        sys.exit(0 if installer.instalar_por_manifesto(manifesto, retomar=args.resume) else 1)
+    elif args.resume:
+        sys.exit(0 if installer.retomar_instalacao() else 1)
+    elif args.comando == "remover":
+        installer.remover_stacks(args.stacks, gc=args.gc, paralelo=args.paralelo, confirmar=not args.sim)
+    elif args.comando == "redeploy":
+        sys.exit(0 if installer.redeploy(args.stacks, timeout=args.timeout) else 1)
+    elif args.comando == "backup":
+        sys.exit(0 if installer.backup(args.destino, args.stacks, jobs=args.jobs) else 1)
+    elif args.comando == "restaurar":
+        sys.exit(0 if installer.restaurar(args.origem, args.stacks, jobs=args.jobs) else 1)
+    elif args.comando == "logs":
+        sys.exit(0 if LogAggregator().executar(args.alvos, since=args.since, tail=args.tail, seguir=args.follow,
+                                               filtro=args.grep, ignorar_maiusculas=args.ignore_case) else 1)
+    elif args.comando == "atualizar-imagens":
+        installer.atualizar_imagens(args.imagens, aplicar=not args.simular, redeploy=args.redeploy)
+    elif args.comando == "status":
+        StackDashboard().executar(args.intervalo, uma_vez=args.uma_vez)
+    elif args.comando == "plano":
+        sys.exit(0 if installer.plano(args.stacks, como_json=args.json) else 1)
+    elif args.comando == "render":
+        sys.exit(0 if installer.render_stacks(args.stacks, saida=args.saida) else 1)
+    elif args.comando == "deploy":
+        sys.exit(0 if installer.deploy_stacks(args.stacks, jobs=args.jobs) else 1)
+    elif args.comando == "migrar" and args.acao == "exportar":
+        sys.exit(0 if installer.migrar_exportar(args.saida, jobs=args.jobs) else 1)
+    elif args.comando == "migrar" and args.acao == "importar":
+        sys.exit(0 if installer.migrar_importar(args.entrada, ip=args.ip, atualizar_dns=not args.sem_dns,
+                                                 jobs=args.jobs) else 1)
+    else:
+        installer.run()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
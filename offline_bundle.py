@@ -0,0 +1,164 @@
+"""
+Pacote offline para instalações sem acesso aos registries
+- Coleta as imagens referenciadas pelas stacks selecionadas
+- Um único `docker save` (camadas compartilhadas gravadas uma vez) comprimido
+- Arquivos do instalador e wheels das dependências Python no mesmo pacote
+- Carga local via `docker load` em streaming
+"""
+import os
+import re
+import json
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from backup_manager import BackupManager
+from stack_plugins import PluginIndex
+
+ARQUIVOS_INSTALADOR = ["instalador_vps.py", "stack_implementations.py", "stack_plugins.py", "backup_manager.py",
+                       "fleet_manager.py", "offline_bundle.py", "bootstrap.sh", "images.lock.json", "stacks/configs"]
+DEPENDENCIAS_PYTHON = ["requests"]
+IMAGEM = re.compile(r"^\s+image:\s*[\"']?([^\s\"']+)", re.MULTILINE)
+
+
+class _ConfigColeta:
+    """Config somente leitura em que chaves ausentes valem '' (para renderizar sem instalação prévia)"""
+
+    def __init__(self, config_manager):
+        self.config_manager = config_manager
+
+    def load_config(self) -> Dict:
+        return defaultdict(str, self.config_manager.load_config())
+
+    def __getattr__(self, nome):
+        return getattr(self.config_manager, nome)
+
+
+class OfflineBundle:
+    """Cria e carrega o pacote offline (tar com manifesto, instalador e imagens)"""
+
+    def __init__(self, config_manager, stack_classes: Dict):
+        self.config_manager = config_manager
+        self.stack_classes = stack_classes
+
+    def imagens(self, stacks: List[str]) -> List[str]:
+        """Imagens dos YAMLs renderizados, incluindo as opcionais ativadas pela configuração atual"""
+        coleta = _ConfigColeta(self.config_manager)
+        imagens = set()
+        for stack_name in stacks:
+            stack_class = self.stack_classes.get(stack_name)
+            if stack_class:
+                yaml_content = stack_class(coleta).generate_yaml("exemplo.com", defaultdict(str))
+                imagens.update(IMAGEM.findall(yaml_content))
+        return sorted(imagens)
+
+    @staticmethod
+    def _pull(imagem: str) -> bool:
+        result = subprocess.run(["docker", "pull", "-q", imagem], capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"[ERRO] Falha ao baixar {imagem}: {result.stderr.strip()}")
+        return result.returncode == 0
+
+    @staticmethod
+    def _wheels(destino: str) -> List[str]:
+        """Baixa as wheels das dependências Python para o cache do bootstrap no host offline"""
+        result = subprocess.run([sys.executable, "-m", "pip", "download", "-q", "-d", destino]
+                                + DEPENDENCIAS_PYTHON, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"[AVISO] Wheels Python não incluídas: {result.stderr.strip()}")
+            return []
+        return sorted(os.listdir(destino))
+
+    def criar(self, arquivo: str, stacks: List[str], jobs: int = 4) -> bool:
+        imagens = self.imagens(stacks)
+        print(f"[+] {len(imagens)} imagem(ns) para {len(stacks)} stack(s)")
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            if not all(executor.map(self._pull, imagens)):
+                return False
+
+        compressor = BackupManager(self.config_manager, {}).compressor
+        extensao = "zst" if compressor[0] == "zstd" else "gz"
+        base = os.path.dirname(os.path.abspath(__file__))
+        with tempfile.TemporaryDirectory(prefix="vps-offline-", dir=os.path.dirname(os.path.abspath(arquivo))) as tmp:
+            caminho_imagens = os.path.join(tmp, f"imagens.tar.{extensao}")
+            print("[+] Exportando imagens (camadas compartilhadas são gravadas uma única vez)...")
+            with open(caminho_imagens, "wb") as destino:
+                save = subprocess.Popen(["docker", "save"] + imagens, stdout=subprocess.PIPE)
+                comprimir = subprocess.Popen(compressor, stdin=save.stdout, stdout=destino)
+                save.stdout.close()
+                comprimir.wait()
+                if save.wait() != 0 or comprimir.returncode != 0:
+                    print("[ERRO] Falha ao exportar as imagens")
+                    return False
+
+            dir_wheels = os.path.join(tmp, "wheels")
+            os.makedirs(dir_wheels)
+            wheels = self._wheels(dir_wheels)
+
+            manifesto = {
+                "criado": datetime.now().isoformat(timespec="seconds"),
+                "stacks": stacks,
+                "imagens": imagens,
+                "wheels": wheels,
+                "arquivo_imagens": os.path.basename(caminho_imagens),
+            }
+            caminho_manifesto = os.path.join(tmp, "bundle.json")
+            with open(caminho_manifesto, "w") as f:
+                json.dump(manifesto, f, indent=2)
+
+            # Sem compressão externa: o conteúdo pesado já está comprimido
+            with tarfile.open(arquivo, "w") as tar:
+                tar.add(caminho_manifesto, arcname="bundle.json")
+                for nome in ARQUIVOS_INSTALADOR:
+                    caminho = os.path.join(base, nome)
+                    if os.path.exists(caminho):
+                        tar.add(caminho, arcname=nome)
+                for caminho in PluginIndex().arquivos():
+                    tar.add(caminho, arcname=f"plugins/{os.path.basename(caminho)}")
+                for wheel in wheels:
+                    tar.add(os.path.join(dir_wheels, wheel), arcname=f"wheels/{wheel}")
+                tar.add(caminho_imagens, arcname=manifesto["arquivo_imagens"])
+
+        tamanho = os.path.getsize(arquivo) / 1048576
+        print(f"[OK] Pacote offline criado: {arquivo} ({tamanho:.0f} MiB)")
+        return True
+
+    def carregar(self, arquivo: str, destino_instalador: Optional[str] = None) -> bool:
+        """Carrega as imagens via `docker load` direto do tar, sem extrair para disco"""
+        manifesto = None
+        with tarfile.open(arquivo, "r|") as tar:
+            for membro in tar:
+                if membro.name == "bundle.json":
+                    manifesto = json.load(tar.extractfile(membro))
+                elif membro.name.startswith("imagens.tar."):
+                    print(f"[+] Carregando imagens de {arquivo}...")
+                    descomprimir = subprocess.Popen(BackupManager.descompressor_para(membro.name),
+                                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+                    load = subprocess.Popen(["docker", "load", "-q"], stdin=descomprimir.stdout)
+                    descomprimir.stdout.close()
+                    origem = tar.extractfile(membro)
+                    shutil.copyfileobj(origem, descomprimir.stdin, 1024 * 1024)
+                    descomprimir.stdin.close()
+                    if descomprimir.wait() != 0 or load.wait() != 0:
+                        print("[ERRO] Falha ao carregar as imagens")
+                        return False
+                elif destino_instalador and (membro.name in ARQUIVOS_INSTALADOR
+                                             or membro.name.startswith(("wheels/", "plugins/", "stacks/configs/"))):
+                    tar.extract(membro, destino_instalador)
+
+        if not manifesto:
+            print("[ERRO] Pacote sem bundle.json")
+            return False
+        print(f"[OK] {len(manifesto['imagens'])} imagem(ns) carregada(s) (pacote de {manifesto['criado']})")
+
+        # Deploys passam a usar só as imagens locais, sem consultar o registry
+        config = self.config_manager.load_config()
+        config["offline"] = True
+        self.config_manager.save_config(config)
+        return True
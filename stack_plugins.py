@@ -0,0 +1,142 @@
+"""
+Descoberta de stacks em plugins
+- Cada plugin é um módulo .py em plugins/ (ou nos diretórios de VPS_INSTALLER_PLUGINS)
+- Declara STACK (metadados no formato do STACK_CONFIG) e create_stack(StackCommand)
+- Índice em cache invalidado por mtime/tamanho: o módulo só é importado quando muda ou é usado
+"""
+import os
+import sys
+import json
+import importlib.util
+from typing import Dict, List, Optional, Set
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+DIRETORIO_PADRAO = os.path.join(BASE, "plugins")
+ARQUIVO_CACHE = os.path.join(BASE, ".vps_installer", "plugins.json")
+CATEGORIAS = {"infraestrutura", "banco_dados", "aplicacao", "monitoramento"}
+VERSAO_CACHE = 1
+
+
+def _aviso(mensagem: str):
+    # stderr: o catálogo (stdout) é lido pelo front-end em shell
+    print(f"[AVISO] {mensagem}", file=sys.stderr)
+
+
+class PluginIndex:
+    """Índice dos plugins de stack, reaproveitado entre execuções"""
+
+    # Chaves de STACK que não vão para o STACK_CONFIG
+    CHAVES_PLUGIN = {"nome", "arquivo", "perfis", "healthchecks", "stop_first"}
+
+    def __init__(self, diretorios: Optional[List[str]] = None, arquivo_cache: str = ARQUIVO_CACHE,
+                 reservados: Optional[Set[str]] = None):
+        if diretorios is None:
+            extras = os.environ.get("VPS_INSTALLER_PLUGINS", "")
+            diretorios = [DIRETORIO_PADRAO] + [d for d in extras.split(os.pathsep) if d]
+        self.diretorios = diretorios
+        self.arquivo_cache = arquivo_cache
+        # Stacks embutidas no instalador: um plugin não pode substituí-las
+        self.reservados = reservados or set()
+        self._indice: Optional[Dict[str, Dict]] = None
+
+    def arquivos(self) -> Dict[str, List[int]]:
+        """Caminho -> [mtime_ns, tamanho] de cada plugin (um scandir por diretório, sem importar nada)"""
+        arquivos = {}
+        for diretorio in self.diretorios:
+            try:
+                entradas = sorted(os.scandir(diretorio), key=lambda e: e.name)
+            except OSError:
+                continue
+            for entrada in entradas:
+                if entrada.name.endswith(".py") and not entrada.name.startswith("_") and entrada.is_file():
+                    stat = entrada.stat()
+                    arquivos[entrada.path] = [stat.st_mtime_ns, stat.st_size]
+        return arquivos
+
+    @staticmethod
+    def _importar(caminho: str):
+        nome = "vps_plugin_" + os.path.splitext(os.path.basename(caminho))[0]
+        spec = importlib.util.spec_from_file_location(nome, caminho)
+        modulo = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(modulo)
+        return modulo
+
+    @staticmethod
+    def _validar(caminho: str, modulo) -> Optional[Dict]:
+        stack = getattr(modulo, "STACK", None)
+        if not isinstance(stack, dict) or not callable(getattr(modulo, "create_stack", None)):
+            _aviso(f"Plugin {caminho} ignorado: precisa declarar STACK e create_stack(StackCommand)")
+            return None
+        faltando = [c for c in ("nome", "categoria", "descricao") if not stack.get(c)]
+        if faltando:
+            _aviso(f"Plugin {caminho} ignorado: STACK sem {', '.join(faltando)}")
+            return None
+        if stack["categoria"] not in CATEGORIAS:
+            _aviso(f"Plugin {caminho} ignorado: categoria '{stack['categoria']}' inválida "
+                  f"({', '.join(sorted(CATEGORIAS))})")
+            return None
+        return json.loads(json.dumps(stack))
+
+    def _ler_cache(self) -> Dict:
+        try:
+            with open(self.arquivo_cache) as f:
+                cache = json.load(f)
+            return cache if cache.get("versao") == VERSAO_CACHE else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _gravar_cache(self, plugins: Dict):
+        try:
+            os.makedirs(os.path.dirname(self.arquivo_cache), exist_ok=True)
+            with open(self.arquivo_cache, "w") as f:
+                json.dump({"versao": VERSAO_CACHE, "plugins": plugins}, f, indent=2)
+        except OSError:
+            # Sem permissão de escrita (ex.: catálogo como usuário comum): indexa de novo na próxima vez
+            pass
+
+    def indexar(self) -> Dict[str, Dict]:
+        """Nome da stack -> metadados (com 'arquivo'); só reimporta plugins novos ou alterados"""
+        if self._indice is not None:
+            return self._indice
+
+        anterior = self._ler_cache().get("plugins", {})
+        arquivos = self.arquivos()
+        plugins = {}
+        for caminho, assinatura in arquivos.items():
+            registro = anterior.get(caminho)
+            if registro and registro["assinatura"] == assinatura:
+                plugins[caminho] = registro
+                continue
+            try:
+                stack = self._validar(caminho, self._importar(caminho))
+            except Exception as e:
+                _aviso(f"Plugin {caminho} ignorado: {e}")
+                stack = None
+            plugins[caminho] = {"assinatura": assinatura, "stack": stack}
+        if plugins != anterior:
+            self._gravar_cache(plugins)
+
+        self._indice = {}
+        for caminho, registro in plugins.items():
+            stack = registro["stack"]
+            if not stack:
+                continue
+            if stack["nome"] in self.reservados:
+                _aviso(f"Plugin {caminho} ignorado: a stack '{stack['nome']}' já existe no instalador")
+                continue
+            if stack["nome"] in self._indice:
+                _aviso(f"Plugin {caminho} ignorado: stack '{stack['nome']}' já declarada em "
+                      f"{self._indice[stack['nome']]['arquivo']}")
+                continue
+            self._indice[stack["nome"]] = {**stack, "arquivo": caminho}
+        return self._indice
+
+    def classes(self, StackCommand) -> Dict[str, type]:
+        """Importa os plugins indexados e cria as classes das stacks (chamado no primeiro uso)"""
+        classes = {}
+        for nome, stack in self.indexar().items():
+            try:
+                classes[nome] = self._importar(stack["arquivo"]).create_stack(StackCommand)
+            except Exception as e:
+                _aviso(f"Falha ao carregar o plugin da stack {nome}: {e}")
+        return classes
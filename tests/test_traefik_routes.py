@@ -0,0 +1,120 @@
+"""
+Tradução das labels traefik.http.* para o arquivo dinâmico do file provider
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from instalador_vps import TraefikRoutes  # noqa: E402
+
+STACK_SIMPLES = """version: "3.8"
+
+services:
+  web:
+    image: exemplo/web:1
+    deploy:
+      labels:
+        - traefik.enable=true
+        - traefik.http.routers.web.rule=Host(`web.exemplo.com`)
+        - traefik.http.routers.web.entrypoints=websecure,web
+        - traefik.http.routers.web.tls.certresolver=le
+        - traefik.http.services.web.loadbalancer.server.port=8080
+        - traefik.http.services.web.loadbalancer.passhostheader=true
+
+  worker:
+    image: exemplo/web:1
+
+networks:
+  externa:
+    external: true
+"""
+
+STACK_DISTRIBUIDA = """version: "3.8"
+
+services:
+  minio1:
+    image: minio/minio:latest
+    deploy:
+      labels:
+        - traefik.http.routers.minio-api.rule=Host(`minio.exemplo.com`)
+        - traefik.http.routers.minio-api.service=minio-api
+        - traefik.http.services.minio-api.loadbalancer.server.port=9000
+  minio2:
+    image: minio/minio:latest
+    deploy:
+      labels:
+        - traefik.http.routers.minio-api.rule=Host(`minio.exemplo.com`)
+        - traefik.http.routers.minio-api.service=minio-api
+        - traefik.http.services.minio-api.loadbalancer.server.port=9000
+"""
+
+
+class ConfigManagerMemoria:
+    def __init__(self):
+        self.rotas = {}
+
+    def load_traefik_routes(self):
+        return dict(self.rotas)
+
+    def save_traefik_routes(self, rotas):
+        self.rotas = dict(rotas)
+
+
+def test_router_com_chaves_canonicas():
+    rotas = TraefikRoutes.extrair_rotas("app", STACK_SIMPLES)
+    router = rotas["routers"]["web"]
+    assert router["rule"] == "Host(`web.exemplo.com`)"
+    assert router["entryPoints"] == ["websecure", "web"]
+    assert router["tls"] == {"certResolver": "le"}
+
+
+def test_router_sem_service_usa_o_do_mesmo_servico():
+    rotas = TraefikRoutes.extrair_rotas("app", STACK_SIMPLES)
+    assert rotas["routers"]["web"]["service"] == "web"
+    assert rotas["services"]["web"] == {"loadBalancer": {"servers": [{"url": "http://app_web:8080"}]}}
+
+
+def test_servicos_swarm_com_o_mesmo_service_viram_servidores():
+    rotas = TraefikRoutes.extrair_rotas("minio", STACK_DISTRIBUIDA)
+    assert rotas["services"]["minio-api"]["loadBalancer"]["servers"] == [
+        {"url": "http://minio_minio1:9000"},
+        {"url": "http://minio_minio2:9000"},
+    ]
+
+
+def test_middleware_sem_opcoes():
+    yaml_content = STACK_SIMPLES.replace(
+        "        - traefik.enable=true\n",
+        "        - traefik.enable=true\n"
+        "        - traefik.http.middlewares.compress.compress=true\n"
+        "        - traefik.http.middlewares.retry.retry.attempts=3\n",
+    )
+    rotas = TraefikRoutes.extrair_rotas("app", yaml_content)
+    assert rotas["middlewares"]["compress"] == {"compress": {}}
+    assert rotas["middlewares"]["retry"] == {"retry": {"attempts": 3}}
+
+
+def test_yaml_dinamico_valido():
+    yaml = pytest.importorskip("yaml")
+    routes = TraefikRoutes(ConfigManagerMemoria())
+    conteudo = routes.gerar_dynamic_yaml({
+        "app": TraefikRoutes.extrair_rotas("app", STACK_SIMPLES),
+        "minio": TraefikRoutes.extrair_rotas("minio", STACK_DISTRIBUIDA),
+    })
+    http = yaml.safe_load(conteudo)["http"]
+    assert http["routers"]["web"]["entryPoints"] == ["websecure", "web"]
+    assert len(http["services"]["minio-api"]["loadBalancer"]["servers"]) == 2
+
+
+def test_atualizar_grava_o_arquivo_e_remove_stacks(tmp_path, monkeypatch):
+    monkeypatch.setattr(TraefikRoutes, "DIRETORIO_HOST", str(tmp_path))
+    routes = TraefikRoutes(ConfigManagerMemoria())
+    caminho = routes.atualizar({"app": TraefikRoutes.extrair_rotas("app", STACK_SIMPLES)})
+    assert "http://app_web:8080" in open(caminho).read()
+
+    routes.atualizar({}, remover=["app"])
+    assert "app_web" not in open(caminho).read()
+    assert os.listdir(tmp_path) == [TraefikRoutes.ARQUIVO]